@@ -38,6 +38,74 @@ SUPABASE_URL = os.getenv('SUPABASE_URL', '')
 SUPABASE_KEY = os.getenv('SUPABASE_KEY', '')
 SUPABASE_BUCKET = os.getenv('SUPABASE_BUCKET', 'profile-pictures')
 
+# Open Library Configuration
+OPENLIBRARY_CONNECT_TIMEOUT = float(os.getenv('OPENLIBRARY_CONNECT_TIMEOUT', '3.05'))  # seconds to connect
+OPENLIBRARY_TIMEOUT = float(os.getenv('OPENLIBRARY_TIMEOUT', '5'))  # seconds to read a response
+OPENLIBRARY_RETRIES = int(os.getenv('OPENLIBRARY_RETRIES', '2'))  # retries for failed GETs outside a request budget (budgeted calls retry once while time allows)
+OPENLIBRARY_MAX_WORKERS = int(os.getenv('OPENLIBRARY_MAX_WORKERS', '8'))  # concurrent lookups per request
+OPENLIBRARY_SEARCH_DEADLINE = float(os.getenv('OPENLIBRARY_SEARCH_DEADLINE', '3'))  # seconds for search enrichment
+OPENLIBRARY_REQUEST_BUDGET = float(os.getenv('OPENLIBRARY_REQUEST_BUDGET', '8'))  # seconds of Open Library calls per incoming request
+OPENLIBRARY_BREAKER_THRESHOLD = int(os.getenv('OPENLIBRARY_BREAKER_THRESHOLD', '5'))  # failures that open an endpoint's circuit
+OPENLIBRARY_BREAKER_WINDOW = int(os.getenv('OPENLIBRARY_BREAKER_WINDOW', '30'))  # seconds failures are counted over
+OPENLIBRARY_BREAKER_COOLDOWN = int(os.getenv('OPENLIBRARY_BREAKER_COOLDOWN', '30'))  # seconds an open circuit fails fast
+SEARCH_CACHE_TIMEOUT = int(os.getenv('SEARCH_CACHE_TIMEOUT', '600'))  # seconds search results are served without refetching
+SEARCH_CACHE_MAX_STALE = int(os.getenv('SEARCH_CACHE_MAX_STALE', str(24 * 3600)))  # older results kept as a fallback
+BOOK_METADATA_TTL = int(os.getenv('BOOK_METADATA_TTL', str(7 * 24 * 3600)))  # seconds before stored metadata is refreshed
+BOOK_METADATA_MAX_STALE = int(os.getenv('BOOK_METADATA_MAX_STALE', str(30 * 24 * 3600)))  # seconds before stale metadata blocks
+AUTHOR_NAME_CACHE_TIMEOUT = int(os.getenv('AUTHOR_NAME_CACHE_TIMEOUT', str(30 * 24 * 3600)))  # author names rarely change
+BOOK_PREVIEW_CACHE_TIMEOUT = int(os.getenv('BOOK_PREVIEW_CACHE_TIMEOUT', str(24 * 3600)))  # shared preview entries
+BOOK_PREVIEW_MISS_CACHE_TIMEOUT = int(os.getenv('BOOK_PREVIEW_MISS_CACHE_TIMEOUT', '300'))  # unknown OLIDs
+BOOK_PREVIEW_STALE_CACHE_TIMEOUT = int(os.getenv('BOOK_PREVIEW_STALE_CACHE_TIMEOUT', '60'))  # entries built from stale metadata
+COVER_CACHE_DIR = os.getenv('COVER_CACHE_DIR', str(BASE_DIR / 'media' / 'covers'))  # content-addressed cover images
+COVER_CACHE_MAX_AGE = int(os.getenv('COVER_CACHE_MAX_AGE', str(30 * 24 * 3600)))  # browser Cache-Control for covers
+COVER_MISS_CACHE_TIMEOUT = int(os.getenv('COVER_MISS_CACHE_TIMEOUT', '3600'))  # covers Open Library doesn't have
+COVER_CACHE_MAX_BYTES = int(os.getenv('COVER_CACHE_MAX_BYTES', str(1024 ** 3)))  # least recently used covers are evicted above this
+
+# Dashboard recommendations (precomputed in the background)
+RECOMMENDATIONS_TTL = int(os.getenv('RECOMMENDATIONS_TTL', str(24 * 3600)))  # seconds before a refresh is scheduled
+RECOMMENDATIONS_STORED = 20  # candidates kept per user
+RECOMMENDATIONS_SHOWN = 12  # shown on the dashboard
+
+# Background job queue (python manage.py run_worker)
+JOB_WORKER_CONCURRENCY = int(os.getenv('JOB_WORKER_CONCURRENCY', '4'))  # jobs run at the same time per worker
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '1'))  # seconds between polls of an empty queue
+JOB_MAX_ATTEMPTS = 5  # tries before a job is marked failed
+JOB_RETRY_BACKOFF = 30  # seconds before the first retry, doubled on each further try
+JOB_LOCK_TIMEOUT = 600  # seconds before a running job whose worker died is requeued
+
+# File storage backends (any Django Storage class), looked up with
+# django.core.files.storage.storages[alias]
+MEDIA_URL = '/media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    # WhiteNoise serves compressed, hashed static files
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+    # Book files served to the reader
+    'books': {
+        'BACKEND': os.getenv('BOOK_STORAGE_BACKEND', 'django.core.files.storage.FileSystemStorage'),
+        'OPTIONS': {'location': os.getenv('BOOK_FILES_DIR', str(MEDIA_ROOT / 'books'))},
+    },
+    # Profile pictures: the Supabase bucket when configured, else local files served by the avatar_file view
+    'avatars': {
+        'BACKEND': 'library.storage.SupabaseStorage',
+        'OPTIONS': {'bucket': SUPABASE_BUCKET},
+    } if SUPABASE_URL else {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {'location': str(MEDIA_ROOT / 'avatars'), 'base_url': f'{MEDIA_URL}avatars/'},
+    },
+}
+BOOK_FILE_RETENTION = int(os.getenv('BOOK_FILE_RETENTION', str(24 * 3600)))  # seconds a replaced book version stays for open readers
+MOCK_BOOK_FILE_KEY = os.getenv('MOCK_BOOK_FILE_KEY', 'mock_book_400_pages')  # served by /api/mock-book/ when uploaded
+
+# Library imports (Goodreads / CSV exports)
+IMPORT_UPLOAD_DIR = os.getenv('IMPORT_UPLOAD_DIR', str(BASE_DIR / 'uploads' / 'imports'))  # must be readable by the worker
+IMPORT_MAX_FILE_SIZE = int(os.getenv('IMPORT_MAX_FILE_SIZE', str(20 * 1024 * 1024)))  # bytes
+
 
 # Application definition
 
@@ -60,14 +128,21 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'library.middleware.OpenLibraryBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'BookMate.urls'
 
+# Shared by every gunicorn worker, so single-flight locks, refresh locks and
+# circuit breakers coordinate across processes. Lives in a table of the main
+# database (python manage.py createcachetable), so it needs no extra service.
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-        "LOCATION": "unique-book-cache",
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "bookmate_cache",
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv('CACHE_MAX_ENTRIES', '50000')),  # entries kept before culling
+        },
     }
 }
 
@@ -139,9 +214,7 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
-
-# WhiteNoise configuration for serving static files
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# Served by WhiteNoise, see STORAGES['staticfiles']
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
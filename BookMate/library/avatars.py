@@ -0,0 +1,58 @@
+import io
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from PIL import Image, ImageOps, features
+
+
+AVATAR_SIZES = {'small': 96, 'medium': 320, 'large': 640}  # square edge in pixels
+AVATAR_QUALITY = 80
+if features.check('webp'):
+    AVATAR_FORMAT, AVATAR_EXTENSION, AVATAR_SAVE_OPTIONS = 'WEBP', 'webp', {'quality': AVATAR_QUALITY, 'method': 4}
+else:  # Pillow built without libwebp
+    AVATAR_FORMAT, AVATAR_EXTENSION, AVATAR_SAVE_OPTIONS = 'JPEG', 'jpg', {'quality': AVATAR_QUALITY, 'optimize': True}
+
+
+def make_avatar_variants(file):
+    """
+    Decodes an uploaded image and returns {size: encoded bytes} for each
+    of AVATAR_SIZES.
+
+    The image is rotated upright from its EXIF orientation, centre-cropped
+    to a square and re-encoded without any metadata, so EXIF (camera, GPS)
+    never reaches storage. Raises ValueError if the file isn't an image.
+    """
+    try:
+        with Image.open(file) as image:
+            image = ImageOps.exif_transpose(image)
+            image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') and AVATAR_FORMAT == 'WEBP' else 'RGB')
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Not a readable image: {e}")
+
+    variants = {}
+    for size, edge in AVATAR_SIZES.items():
+        variant = ImageOps.fit(image, (min(edge, image.width, image.height),) * 2, Image.LANCZOS)
+        output = io.BytesIO()
+        variant.save(output, format=AVATAR_FORMAT, **AVATAR_SAVE_OPTIONS)
+        variants[size] = output.getvalue()
+    return variants
+
+
+def save_avatar(user_id, file):
+    """
+    Normalizes an uploaded avatar and stores its variants in the avatars
+    storage, uploading them concurrently. Returns {size: (name, url)}.
+    """
+    storage = storages["avatars"]
+    token = uuid.uuid4().hex
+
+    def store(item):
+        size, data = item
+        name = storage.save(f"{user_id}_{token}_{size}.{AVATAR_EXTENSION}", ContentFile(data))
+        return size, (name, storage.url(name))
+
+    variants = make_avatar_variants(file)
+    with ThreadPoolExecutor(max_workers=len(variants)) as executor:
+        return dict(executor.map(store, variants.items()))
@@ -0,0 +1,93 @@
+import hashlib
+import re
+
+from django.core.files import File
+
+from .models import BookFile
+from .storage import get_book_storage
+from .tasks import cancel_file_deletion, enqueue_book_split
+
+
+BOOK_FILE_CHUNK_SIZE = 64 * 1024  # bytes read per chunk when hashing and streaming
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def save_book_file(key, file_obj, content_type='application/pdf'):
+    """
+    Stores a new version of a book file and points its BookFile row at it.
+
+    Versions are named by content hash ({key}/{sha256}.pdf), so a re-upload
+    of the same bytes changes nothing and a new upload gets a new ETag.
+    New versions are queued to be split into pages for the reader.
+    Returns (book_file, old_name), where old_name is the replaced version's
+    path (or None) for the caller to delete once no reader needs it.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: file_obj.read(BOOK_FILE_CHUNK_SIZE), b""):
+        digest.update(chunk)
+        size += len(chunk)
+    sha256 = digest.hexdigest()
+    file_obj.seek(0)
+
+    storage = get_book_storage()
+    name = f"{key}/{sha256}.pdf"
+    if not storage.exists(name):
+        name = storage.save(name, File(file_obj))
+
+    book_file = BookFile.objects.filter(key=key).first()
+    old_name = book_file.name if book_file and book_file.name != name else None
+    page_count = book_file.page_count if book_file and book_file.sha256 == sha256 else None
+    book_file, _ = BookFile.objects.update_or_create(
+        key=key,
+        defaults={"name": name, "content_type": content_type, "size": size, "sha256": sha256, "page_count": page_count},
+    )
+    if old_name:
+        # An earlier version may be coming back, with its deletion still queued
+        cancel_file_deletion("books", name)
+    if page_count is None:
+        enqueue_book_split(key, sha256)
+    return book_file, old_name
+
+
+def parse_range(header, size):
+    """
+    Parses a single-range `Range: bytes=...` header against a file size.
+
+    Returns (start, end) with `end` inclusive, None if the header should be
+    ignored (absent, malformed or multi-range: serve the whole file), or
+    False if the range can't be satisfied.
+    """
+    match = RANGE_RE.match((header or "").strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def iter_file_range(name, start, end):
+    """Yields bytes start..end (inclusive) of a stored file in chunks"""
+    with get_book_storage().open(name, 'rb') as stored_file:
+        stored_file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = stored_file.read(min(BOOK_FILE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
@@ -0,0 +1,112 @@
+import hashlib
+import io
+
+from django.core.files.base import ContentFile
+
+from .models import BookFile, BookPage
+from .storage import get_book_storage
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # needed to split books into pages; the reader falls back to the whole PDF
+    PdfReader = None
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # optional; pages are then text-only
+    pdfium = None
+
+
+PAGE_IMAGE_WIDTH = 800  # pixels; a light render for reading, not print quality
+PAGE_IMAGE_QUALITY = 70
+PAGE_BATCH_SIZE = 50  # pages inserted per query
+PAGE_WINDOW_MAX = 20  # most pages one window request may return
+
+
+def page_image_name(digest):
+    """Content-addressed path of a page render: pages/ab/abcdef....jpg"""
+    return f"pages/{digest[:2]}/{digest}.jpg"
+
+
+def render_page(document, index):
+    """Returns a JPEG of one page scaled to PAGE_IMAGE_WIDTH pixels wide"""
+    page = document[index]
+    try:
+        bitmap = page.render(scale=PAGE_IMAGE_WIDTH / page.get_width())
+        output = io.BytesIO()
+        bitmap.to_pil().convert('RGB').save(output, format='JPEG', quality=PAGE_IMAGE_QUALITY, optimize=True)
+        return output.getvalue()
+    finally:
+        page.close()
+
+
+def store_page_image(data):
+    """Stores a page render once per distinct content; returns its storage name"""
+    storage = get_book_storage()
+    name = page_image_name(hashlib.sha256(data).hexdigest())
+    if not storage.exists(name):
+        name = storage.save(name, ContentFile(data))
+    return name
+
+
+def split_book_file(key):
+    """
+    Splits the current version of a book file into per-page artifacts.
+
+    Each page gets its extracted text and, when pypdfium2 is installed, a
+    light JPEG render. Pages belong to the content hash, not the BookFile,
+    so a version is only ever split once and re-uploads of it are free.
+    Sets BookFile.page_count when done.
+    """
+    if PdfReader is None:
+        raise RuntimeError("pypdf is not installed; can't split book files into pages")
+
+    book_file = BookFile.objects.get(key=key)
+    sha256 = book_file.sha256
+    done = set(BookPage.objects.filter(sha256=sha256).values_list('number', flat=True))
+
+    storage = get_book_storage()
+    with storage.open(book_file.name, 'rb') as pdf_file:
+        reader = PdfReader(pdf_file)
+        page_count = len(reader.pages)
+
+        # pdfium gets its own handle, so the two readers don't fight over seek()
+        document = pdfium.PdfDocument(storage.open(book_file.name, 'rb'), autoclose=True) if pdfium else None
+
+        try:
+            batch = []
+            for index, page in enumerate(reader.pages):
+                number = index + 1
+                if number in done:
+                    continue
+                batch.append(BookPage(
+                    sha256=sha256,
+                    number=number,
+                    text=page.extract_text() or "",
+                    image_name=store_page_image(render_page(document, index)) if document else None,
+                ))
+                if len(batch) >= PAGE_BATCH_SIZE:
+                    BookPage.objects.bulk_create(batch, ignore_conflicts=True)
+                    batch = []
+            BookPage.objects.bulk_create(batch, ignore_conflicts=True)
+        finally:
+            if document is not None:
+                document.close()
+
+    BookFile.objects.filter(pk=book_file.pk, sha256=sha256).update(page_count=page_count)
+    return page_count
+
+
+def get_page_window(book_file, around, before=2, after=3):
+    """
+    Returns the pages of a book file's current version around a page,
+    clamped to the book, as a list of BookPage rows in order.
+    """
+    around = min(max(around, 1), book_file.page_count)
+    before, after = max(before, 0), max(after, 0)
+    if before + after + 1 > PAGE_WINDOW_MAX:
+        after = max(PAGE_WINDOW_MAX - 1 - before, 0)
+        before = PAGE_WINDOW_MAX - 1 - after
+    first = max(around - before, 1)
+    last = min(around + after, book_file.page_count)
+    return list(BookPage.objects.filter(sha256=book_file.sha256, number__gte=first, number__lte=last).order_by('number'))
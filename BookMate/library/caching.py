@@ -0,0 +1,142 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connection
+
+from .openlibrary import time_left
+
+
+REFRESH_LOCK_TIMEOUT = 60  # seconds a cross-worker refresh lock is held at most
+FLIGHT_LOCK_TIMEOUT = 30  # seconds a cross-worker single-flight lock is held at most
+FLIGHT_RESULT_TIMEOUT = 10  # seconds a leader's result stays readable by other workers
+FLIGHT_WAIT = 15  # seconds a follower waits before doing the work itself
+FLIGHT_POLL_INTERVAL = 0.05  # seconds before the first check for another worker's result
+FLIGHT_MAX_POLL_INTERVAL = 1  # the interval doubles after each check, up to this
+
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def flight_wait():
+    """
+    Seconds a follower may wait for a leader: FLIGHT_WAIT, or less when the
+    current request's Open Library budget ends sooner.
+    """
+    left = time_left()
+    return FLIGHT_WAIT if left is None else max(min(FLIGHT_WAIT, left), 0)
+
+
+class _Flight:
+    """An in-progress call that other threads can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def single_flight(key, func, *args):
+    """
+    Calls func(*args) so that only one call per key is in flight at a time.
+
+    Threads in the same worker that ask for a key already being computed
+    wait for the leader and share its result (or exception). Across workers
+    a cache.add() lock elects one leader, which publishes its result in the
+    cache for the others. A follower that waits longer than FLIGHT_WAIT
+    seconds (or the rest of its request budget) gives up and calls func
+    itself.
+    """
+    with _flights_lock:
+        flight = _flights.get(key)
+        is_leader = flight is None
+        if is_leader:
+            flight = _flights[key] = _Flight()
+
+    if not is_leader:
+        if not flight.done.wait(flight_wait()):
+            return func(*args)
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    try:
+        flight.result = _single_flight_across_workers(key, func, *args)
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.done.set()
+    return flight.result
+
+
+def _single_flight_across_workers(key, func, *args):
+    lock_key = f"flight_lock_{key}"
+    result_key = f"flight_result_{key}"
+
+    if cache.add(lock_key, 1, timeout=FLIGHT_LOCK_TIMEOUT):
+        try:
+            result = func(*args)
+            # Wrapped in a tuple so a None result is still distinguishable from a miss
+            cache.set(result_key, (result,), timeout=FLIGHT_RESULT_TIMEOUT)
+            return result
+        finally:
+            cache.delete(lock_key)
+
+    # Another worker is leading; wait for it to publish its result, polling
+    # less often the longer it takes so waiting costs few cache queries
+    deadline = time.monotonic() + flight_wait()
+    interval = FLIGHT_POLL_INTERVAL
+    while time.monotonic() < deadline:
+        time.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+        interval = min(interval * 2, FLIGHT_MAX_POLL_INTERVAL)
+        state = cache.get_many([result_key, lock_key])
+        if result_key in state:
+            return state[result_key][0]
+        if lock_key not in state:
+            # Leader is done; it either published just now or raised
+            published = cache.get(result_key)
+            if published is not None:
+                return published[0]
+            break
+    return func(*args)
+
+
+def refresh_in_background(key, func, *args):
+    """
+    Runs func(*args) on a daemon thread, at most once at a time per key.
+
+    A per-process set stops the same worker from starting a second refresh,
+    and a cache.add() lock in the shared cache does the same across
+    workers. Returns True if a refresh was started.
+    """
+    with _refreshing_lock:
+        if key in _refreshing:
+            return False
+        _refreshing.add(key)
+
+    lock_key = f"refresh_lock_{key}"
+    if not cache.add(lock_key, 1, timeout=REFRESH_LOCK_TIMEOUT):
+        with _refreshing_lock:
+            _refreshing.discard(key)
+        return False
+
+    def run():
+        try:
+            func(*args)
+        except Exception as e:
+            print(f"Error refreshing {key}: {e}")
+        finally:
+            cache.delete(lock_key)
+            with _refreshing_lock:
+                _refreshing.discard(key)
+            # Threads get their own DB connection; don't leak it
+            connection.close()
+
+    threading.Thread(target=run, daemon=True).start()
+    return True
@@ -0,0 +1,196 @@
+import hashlib
+import io
+import os
+import re
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+
+from .caching import single_flight
+from .jobs import enqueue
+from .openlibrary import fetch_cover
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; thumbnails then fall back to Open Library's medium size
+    Image = None
+
+
+COVER_KINDS = ('id', 'olid', 'isbn')
+COVER_SIZES = ('S', 'M', 'L')  # sizes Open Library serves
+COVER_THUMBNAILS = {'thumb': 128, 'grid': 256}  # our own variants: name -> width in pixels
+THUMBNAIL_QUALITY = 80
+COVER_TOUCH_INTERVAL = 24 * 3600  # a served image's mtime is refreshed at most this often
+COVER_PRUNE_DELAY = 300  # seconds between a new cover being stored and the size check
+
+COVER_KEY_RE = re.compile(r"^[A-Za-z0-9]+$")
+OPENLIBRARY_COVER_RE = re.compile(r"^https?://covers\.openlibrary\.org/b/(id|olid|isbn)/([A-Za-z0-9]+)-([SML])\.jpg")
+
+
+def is_valid_cover(kind, key, size):
+    return kind in COVER_KINDS and bool(COVER_KEY_RE.match(key)) and (size in COVER_SIZES or size in COVER_THUMBNAILS)
+
+
+def local_cover_url(url, size=None):
+    """
+    Maps an Open Library cover URL to our cover endpoint, optionally at
+    another size or thumbnail variant. Other URLs are returned unchanged.
+    """
+    match = OPENLIBRARY_COVER_RE.match(url or "")
+    if not match:
+        return url
+    kind, key, original_size = match.groups()
+    return reverse('cover_image', args=[kind, key, size or original_size])
+
+
+def object_path(digest):
+    """Content-addressed location of a stored image: objects/ab/abcdef....jpg"""
+    return os.path.join(settings.COVER_CACHE_DIR, 'objects', digest[:2], f"{digest}.jpg")
+
+
+def ref_path(kind, key, size):
+    """File holding the digest of the image stored for a cover and size"""
+    return os.path.join(settings.COVER_CACHE_DIR, 'refs', kind, f"{key}-{size}")
+
+
+def write_atomically(path, data):
+    """Writes a file via a temporary file and rename, so readers never see half of it"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def store_cover(kind, key, size, data):
+    """Stores image bytes under their SHA-256 and points the cover's ref at them"""
+    digest = hashlib.sha256(data).hexdigest()
+    if not os.path.exists(object_path(digest)):
+        write_atomically(object_path(digest), data)
+        # The cache grew; check its size once the burst of new covers settles
+        enqueue("prune_covers", dedupe_key="prune_covers", delay=COVER_PRUNE_DELAY)
+    write_atomically(ref_path(kind, key, size), digest.encode())
+    return digest
+
+
+def read_stored_cover(kind, key, size):
+    """Returns (path, digest) if the cover is on disk, else None"""
+    try:
+        with open(ref_path(kind, key, size)) as ref_file:
+            digest = ref_file.read().strip()
+    except OSError:
+        return None
+    path = object_path(digest)
+    try:
+        # mtime doubles as "last used", so eviction keeps covers that are still served
+        if os.stat(path).st_mtime < time.time() - COVER_TOUCH_INTERVAL:
+            os.utime(path)
+    except OSError:
+        return None
+    return path, digest
+
+
+def make_thumbnail(data, width):
+    """Returns a JPEG of the image scaled down to `width` pixels wide"""
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert('RGB')
+        if image.width > width:
+            image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, format='JPEG', quality=THUMBNAIL_QUALITY, optimize=True, progressive=True)
+        return output.getvalue()
+
+
+def load_cover(kind, key, size):
+    """Fetches (or derives) a cover and stores it; returns (path, digest) or None"""
+    if size in COVER_THUMBNAILS:
+        if Image is None:
+            source = get_cover(kind, key, 'M')
+            if source is None:
+                return None
+            # Point the variant at the medium image; content addressing keeps one copy
+            with open(source[0], 'rb') as source_file:
+                digest = store_cover(kind, key, size, source_file.read())
+        else:
+            source = get_cover(kind, key, 'L')
+            if source is None:
+                return None
+            with open(source[0], 'rb') as source_file:
+                digest = store_cover(kind, key, size, make_thumbnail(source_file.read(), COVER_THUMBNAILS[size]))
+        return object_path(digest), digest
+
+    data = fetch_cover(kind, key, size)
+    if data is None:
+        cache.set(f"cover_miss_{kind}_{key}_{size}", True, timeout=settings.COVER_MISS_CACHE_TIMEOUT)
+        return None
+    digest = store_cover(kind, key, size, data)
+    return object_path(digest), digest
+
+
+def get_cover(kind, key, size):
+    """
+    Returns (path, digest) of a cover image on local disk, fetching it from
+    Open Library the first time, or None if it has no such cover.
+
+    Images are stored once per distinct content under their SHA-256, with a
+    small ref file per (kind, key, size). Concurrent requests for the same
+    cover share one fetch. Raises requests.RequestException if Open Library
+    can't be reached.
+    """
+    stored = read_stored_cover(kind, key, size)
+    if stored:
+        return stored
+    if cache.get(f"cover_miss_{kind}_{key}_{size}"):
+        return None
+    return single_flight(f"cover_{kind}_{key}_{size}", load_cover, kind, key, size)
+
+
+def prune_covers(max_bytes=None):
+    """
+    Evicts the least recently used images until the cover cache fits in
+    `max_bytes` (COVER_CACHE_MAX_BYTES by default), and drops refs whose
+    image is gone. Returns the number of images removed.
+
+    Evicted covers are simply fetched again the next time they are asked for.
+    """
+    max_bytes = settings.COVER_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    objects = []
+    for root, _, files in os.walk(os.path.join(settings.COVER_CACHE_DIR, 'objects')):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            objects.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in objects)
+    removed = 0
+    for _, size, path in sorted(objects):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+
+    if removed:
+        for root, _, files in os.walk(os.path.join(settings.COVER_CACHE_DIR, 'refs')):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    with open(path) as ref_file:
+                        if not os.path.exists(object_path(ref_file.read().strip())):
+                            os.remove(path)
+                except OSError:
+                    continue
+    return removed
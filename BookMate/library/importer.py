@@ -0,0 +1,229 @@
+import csv
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import LibraryImport, UserBookList
+from .openlibrary import fetch_books_by_isbn, search_edition
+from .tasks import enqueue_books_enrichment
+
+
+IMPORT_BATCH_SIZE = 500  # rows resolved and inserted together
+MAX_REPORTED_ERRORS = 20
+
+# Goodreads exclusive shelves (and plain-format status values) to reading status
+SHELF_STATUS = {
+    'read': 'finished',
+    'finished': 'finished',
+    'currently-reading': 'reading',
+    'reading': 'reading',
+    'to-read': 'to_read',
+    'to_read': 'to_read',
+}
+FAVORITE_SHELVES = {'favorites', 'favourites'}
+OLID_PATTERN = re.compile(r"^OL\d+[MW]$")
+
+
+def clean_isbn(value):
+    """Returns a bare ISBN-10/13 from an export cell (Goodreads writes ="0439023483"), or None"""
+    isbn = re.sub(r"[^0-9Xx]", "", value or "").upper()
+    return isbn if len(isbn) in (10, 13) else None
+
+
+def parse_int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_row(row):
+    """
+    Maps a CSV row to the fields we import, or returns None if it has no title or OLID.
+    Raises ValueError if the row names an OLID that is not an edition or work key.
+
+    Understands the Goodreads export columns (Title, Author, ISBN, ISBN13,
+    My Rating, Number of Pages, Exclusive Shelf, Bookshelves) and a plain
+    format (title, author, isbn, olid, pages, status, rating, tags,
+    current_page, is_favorite), which is what the library export writes.
+    Headers are matched case-insensitively.
+    """
+    row = {(key or "").strip().lower(): (value or "").strip() for key, value in row.items()}
+
+    title = row.get("title")
+    olid = row.get("olid")
+    if not title and not olid:
+        return None
+    if olid and (len(olid) > UserBookList._meta.get_field("olid").max_length or not OLID_PATTERN.match(olid)):
+        raise ValueError(f"Invalid OLID '{olid[:50]}'")
+
+    shelves = [s.strip() for s in (row.get("bookshelves") or row.get("tags") or "").split(",") if s.strip()]
+    shelf = (row.get("exclusive shelf") or row.get("shelf") or row.get("status") or "").lower()
+    rating = parse_int(row.get("my rating") or row.get("rating"))
+
+    return {
+        "title": (title or "Unknown Title")[:255],
+        "author": (row.get("author") or "")[:255] or None,
+        "olid": olid or None,
+        "isbns": [isbn for isbn in (clean_isbn(row.get("isbn13")), clean_isbn(row.get("isbn"))) if isbn],
+        "pages": parse_int(row.get("number of pages") or row.get("pages")) or 0,
+        "status": SHELF_STATUS.get(shelf, 'to_read'),
+        "current_page": parse_int(row.get("current_page") or row.get("current page")) or 0,
+        "rating": rating if rating and 1 <= rating <= 5 else None,
+        "is_favorite": row.get("is_favorite", "").lower() in ("true", "1", "yes")
+        or any(s.lower() in FAVORITE_SHELVES for s in shelves),
+        "tags": [s for s in shelves if s.lower() not in FAVORITE_SHELVES and s.lower() not in SHELF_STATUS],
+    }
+
+
+def resolve_olids(entries):
+    """
+    Fills in entry["olid"] (and pages, when known) for a batch of entries.
+
+    ISBNs are resolved with batched Books API calls; entries with neither
+    an OLID nor a known ISBN fall back to concurrent title/author searches.
+    """
+    isbn_data = fetch_books_by_isbn([isbn for entry in entries if not entry["olid"] for isbn in entry["isbns"]])
+    for entry in entries:
+        if entry["olid"]:
+            continue
+        for isbn in entry["isbns"]:
+            data = isbn_data.get(isbn)
+            if data and data.get("key"):
+                entry["olid"] = data["key"].rsplit("/", 1)[-1]
+                entry["pages"] = entry["pages"] or data.get("number_of_pages") or 0
+                break
+
+    unresolved = [entry for entry in entries if not entry["olid"]]
+    if not unresolved:
+        return
+
+    def search(entry):
+        return search_edition(entry["title"], entry["author"])
+
+    with ThreadPoolExecutor(max_workers=settings.OPENLIBRARY_MAX_WORKERS) as executor:
+        for entry, doc in zip(unresolved, executor.map(search, unresolved)):
+            if not doc:
+                continue
+            olid = doc.get("cover_edition_key") or (doc.get("edition_key") or [None])[0]
+            if olid:
+                entry["olid"] = olid
+                entry["pages"] = entry["pages"] or doc.get("number_of_pages_median") or 0
+
+
+def build_book(user_id, entry):
+    """Returns an unsaved UserBookList for an entry, with shelf and progress mapped"""
+    pages = entry["pages"]
+    status = entry["status"]
+    if status == 'finished':
+        current_page = pages
+    elif status == 'reading':
+        current_page = entry["current_page"] or 1
+    else:
+        current_page = 0
+
+    return UserBookList(
+        user_id=user_id,
+        olid=entry["olid"],
+        title=entry["title"],
+        author=entry["author"],
+        cover_url=f"https://covers.openlibrary.org/b/olid/{entry['olid']}-M.jpg",
+        pages=pages,
+        current_page=current_page,
+        # Read shelf stays finished even while the page count is unknown
+        status=status if status == 'finished' else UserBookList.compute_status(current_page, pages),
+        rating=entry["rating"],
+        is_favorite=entry["is_favorite"],
+        tags=", ".join(entry["tags"]),
+    )
+
+
+def import_batch(library_import, entries):
+    """Resolves and bulk-inserts one batch; returns (imported, skipped, errors)"""
+    resolve_olids(entries)
+
+    errors = [f"No Open Library match for '{entry['title']}'" for entry in entries if not entry["olid"]]
+    entries = [entry for entry in entries if entry["olid"]]
+
+    user_id = library_import.user_id
+    existing = set(
+        UserBookList.objects.filter(user_id=user_id, olid__in=[entry["olid"] for entry in entries])
+        .values_list("olid", flat=True)
+    )
+    new_books = {}
+    for entry in entries:
+        if entry["olid"] not in existing and entry["olid"] not in new_books:
+            new_books[entry["olid"]] = build_book(user_id, entry)
+
+    if new_books:
+        UserBookList.objects.bulk_create(new_books.values(), ignore_conflicts=True, batch_size=IMPORT_BATCH_SIZE)
+
+        tagged = {olid: book.get_tags_list() for olid, book in new_books.items() if book.tags}
+        if tagged:
+            ids = dict(
+                UserBookList.objects.filter(user_id=user_id, olid__in=tagged.keys()).values_list("olid", "id")
+            )
+            UserBookList.bulk_sync_tags(user_id, {ids[olid]: tags for olid, tags in tagged.items() if olid in ids})
+
+        enqueue_books_enrichment(new_books.keys())
+
+    skipped = len(entries) - len(new_books) + len(errors)
+    return len(new_books), skipped, errors
+
+
+def run_import(import_id):
+    """
+    Streams an uploaded CSV into the user's library in batches.
+
+    The file is read row by row and never loaded whole; progress counters
+    on the LibraryImport row are updated after every batch so the client
+    can poll them. The upload is deleted when the import ends.
+    """
+    library_import = LibraryImport.objects.get(pk=import_id)
+    LibraryImport.objects.filter(pk=import_id).update(status='running')
+    errors = []
+
+    try:
+        with open(library_import.file_path, newline="", encoding="utf-8-sig") as csv_file:
+            rows = csv.DictReader(csv_file)
+            while True:
+                batch = list(islice(rows, IMPORT_BATCH_SIZE))
+                if not batch:
+                    break
+
+                entries, row_errors = [], []
+                for row in batch:
+                    try:
+                        entry = normalize_row(row)
+                    except ValueError as e:
+                        row_errors.append(str(e))
+                        continue
+                    if entry:
+                        entries.append(entry)
+
+                imported, skipped, batch_errors = import_batch(library_import, entries)
+                errors.extend(row_errors[:MAX_REPORTED_ERRORS - len(errors)])
+                errors.extend(batch_errors[:MAX_REPORTED_ERRORS - len(errors)])
+
+                LibraryImport.objects.filter(pk=import_id).update(
+                    processed_rows=F("processed_rows") + len(batch),
+                    imported_books=F("imported_books") + imported,
+                    skipped_rows=F("skipped_rows") + skipped + (len(batch) - len(entries)),
+                    errors=errors,
+                )
+    except Exception as e:
+        errors.append(f"Import stopped: {e}")
+        LibraryImport.objects.filter(pk=import_id).update(status='failed', errors=errors, finished_at=timezone.now())
+        raise
+    else:
+        LibraryImport.objects.filter(pk=import_id).update(status='done', finished_at=timezone.now())
+    finally:
+        try:
+            os.remove(library_import.file_path)
+        except OSError:
+            pass
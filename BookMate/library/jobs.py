@@ -0,0 +1,140 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+
+HANDLERS = {}
+
+
+def task(kind):
+    """Registers a function as the handler for jobs of the given kind"""
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind, payload=None, dedupe_key=None, delay=0, max_attempts=None):
+    """
+    Adds a job to the queue and returns it.
+
+    If `dedupe_key` is given and a pending or running job already has it,
+    no new job is created and the existing one is returned instead.
+    """
+    try:
+        with transaction.atomic():
+            return Job.objects.create(
+                kind=kind,
+                payload=payload or {},
+                dedupe_key=dedupe_key,
+                run_after=timezone.now() + timedelta(seconds=delay),
+                max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+            )
+    except IntegrityError:
+        return Job.objects.filter(dedupe_key=dedupe_key, status__in=['pending', 'running']).first()
+
+
+def enqueue_many(kind, payloads, dedupe_keys=None):
+    """
+    Adds several jobs of one kind with a single INSERT.
+
+    Jobs whose dedupe key is already pending or running are skipped.
+    """
+    dedupe_keys = dedupe_keys or [None] * len(payloads)
+    Job.objects.bulk_create(
+        [
+            Job(kind=kind, payload=payload, dedupe_key=dedupe_key, max_attempts=settings.JOB_MAX_ATTEMPTS)
+            for payload, dedupe_key in zip(payloads, dedupe_keys)
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def heartbeat_jobs(job_ids):
+    """
+    Refreshes the lock on jobs this worker is still running, so long jobs
+    (big imports, splitting a large book) never look abandoned. Locks are
+    only touched once they are a third of JOB_LOCK_TIMEOUT old.
+    """
+    if not job_ids:
+        return 0
+    now = timezone.now()
+    return Job.objects.filter(
+        pk__in=job_ids, status='running', locked_at__lt=now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT / 3)
+    ).update(locked_at=now)
+
+
+def requeue_stale_jobs(held=()):
+    """
+    Puts jobs back in the queue if their worker died while running them.
+
+    The lost run counts as an attempt, so a job that has used up
+    `max_attempts` is marked failed instead of being run again. Jobs in
+    `held` (running in this worker) are left alone.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+    stale = Job.objects.filter(status='running', locked_at__lt=cutoff).exclude(pk__in=held)
+    error = "Worker stopped while running the job"
+    failed = stale.filter(attempts__gte=F('max_attempts') - 1).update(
+        status='failed', attempts=F('attempts') + 1, locked_at=None, last_error=error
+    )
+    requeued = stale.update(status='pending', attempts=F('attempts') + 1, locked_at=None, last_error=error)
+    return requeued + failed
+
+
+def claim_jobs(limit):
+    """
+    Claims up to `limit` due jobs for this worker.
+
+    Each job is claimed with a conditional UPDATE, so two workers polling
+    at once never run the same job.
+    """
+    now = timezone.now()
+    candidates = Job.objects.filter(status='pending', run_after__lte=now).order_by('run_after')
+    claimed = []
+    for job in candidates[:limit * 2]:
+        if len(claimed) >= limit:
+            break
+        if Job.objects.filter(pk=job.pk, status='pending').update(status='running', locked_at=now):
+            job.status, job.locked_at = 'running', now
+            claimed.append(job)
+    return claimed
+
+
+def run_job(job):
+    """
+    Runs a claimed job. Failures are retried with exponential backoff
+    until `max_attempts`, after which the job is marked failed.
+    """
+    from . import tasks  # noqa: F401 (registers the handlers)
+
+    try:
+        handler = HANDLERS.get(job.kind)
+        if handler is None:
+            raise ValueError(f"No handler for job kind '{job.kind}'")
+        handler(**job.payload)
+    except Exception as e:
+        attempts = job.attempts + 1
+        if attempts >= job.max_attempts:
+            Job.objects.filter(pk=job.pk).update(
+                status='failed', attempts=attempts, locked_at=None, last_error=str(e)
+            )
+        else:
+            backoff = settings.JOB_RETRY_BACKOFF * (2 ** (attempts - 1))
+            Job.objects.filter(pk=job.pk).update(
+                status='pending', attempts=attempts, locked_at=None, last_error=str(e),
+                run_after=timezone.now() + timedelta(seconds=backoff),
+            )
+        print(f"Job {job.pk} ({job.kind}) failed: {e}")
+        return False
+    else:
+        Job.objects.filter(pk=job.pk).update(status='done', attempts=job.attempts + 1, locked_at=None)
+        return True
+    finally:
+        # Worker threads get their own DB connection; don't leak it
+        connection.close()
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from library.bookfiles import save_book_file
+from library.tasks import enqueue_file_deletion
+
+
+class Command(BaseCommand):
+    help = "Uploads a PDF to book storage as the current version of a book file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("key", help="Book file key, e.g. mock_book_400_pages")
+        parser.add_argument("path", help="Path of the PDF to upload")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["path"], "rb") as pdf_file:
+                book_file, old_name = save_book_file(options["key"], pdf_file)
+        except OSError as e:
+            raise CommandError(f"Can't read {options['path']}: {e}")
+
+        if old_name:
+            # Readers may still be fetching ranges of the old version
+            enqueue_file_deletion("books", old_name, delay=settings.BOOK_FILE_RETENTION)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {book_file.key} version {book_file.version} ({book_file.size} bytes)"
+        ))
@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from library.models import UserProfile
+from library.recommendations import compute_recommendations
+
+
+class Command(BaseCommand):
+    help = "Recomputes outdated dashboard recommendations (run on a schedule, e.g. cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Recompute every user, not just outdated ones")
+
+    def handle(self, *args, **options):
+        profiles = UserProfile.objects.all()
+        if not options["all"]:
+            cutoff = timezone.now() - timedelta(seconds=settings.RECOMMENDATIONS_TTL)
+            profiles = profiles.filter(
+                Q(recommendations_updated_at__isnull=True) | Q(recommendations_updated_at__lt=cutoff)
+            )
+
+        count = 0
+        for user_id in profiles.values_list("user_id", flat=True).iterator():
+            compute_recommendations(user_id)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Refreshed recommendations for {count} user(s)"))
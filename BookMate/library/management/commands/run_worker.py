@@ -0,0 +1,44 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from library.jobs import claim_jobs, heartbeat_jobs, requeue_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = "Runs queued background jobs (book enrichment, etc.)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency", type=int, default=settings.JOB_WORKER_CONCURRENCY,
+            help="Maximum number of jobs run at the same time",
+        )
+        parser.add_argument(
+            "--poll-interval", type=float, default=settings.JOB_POLL_INTERVAL,
+            help="Seconds to sleep when the queue is empty",
+        )
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is empty")
+
+    def handle(self, *args, **options):
+        concurrency = max(options["concurrency"], 1)
+        running = {}  # future -> job id
+
+        self.stdout.write(f"Worker started (concurrency {concurrency})")
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            while True:
+                running = {future: job_id for future, job_id in running.items() if not future.done()}
+                heartbeat_jobs(list(running.values()))
+                requeue_stale_jobs(held=list(running.values()))
+
+                jobs = claim_jobs(concurrency - len(running)) if len(running) < concurrency else []
+                for job in jobs:
+                    running[executor.submit(run_job, job)] = job.pk
+
+                if not jobs:
+                    if options["once"] and not running:
+                        break
+                    time.sleep(options["poll_interval"])
+
+        self.stdout.write(self.style.SUCCESS("Worker stopped"))
@@ -0,0 +1,179 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import openlibrary
+from .caching import refresh_in_background, single_flight
+from .models import BookMetadata
+from .openlibrary import fetch_author_names, fetch_page_count, fetch_page_counts, parse_pagination
+
+
+def guess_kind(olid):
+    """Guesses whether an OLID names a work or an edition from its suffix (OL...W / OL...M)"""
+    return "work" if olid.upper().endswith("W") else "edition"
+
+
+def extract_description(data):
+    """Returns the best description text in a work or edition record"""
+    if "description" in data:
+        return data["description"]["value"] if isinstance(data["description"], dict) else data["description"]
+    elif "excerpts" in data and data["excerpts"]:
+        return data["excerpts"][0].get("excerpt", "")
+    elif "first_sentence" in data:
+        return data["first_sentence"].get("value", "") if isinstance(data["first_sentence"], dict) else data["first_sentence"]
+    elif "notes" in data:
+        return data["notes"]["value"] if isinstance(data["notes"], dict) else data["notes"]
+    return "No description available."
+
+
+def author_cache_key(key):
+    """Returns the cache key for an author key (e.g. /authors/OL23919A)"""
+    return f"author_name_{key.rsplit('/', 1)[-1]}"
+
+
+def resolve_authors(data):
+    """
+    Returns the author names of a work or edition record.
+
+    Names are cached per author key for AUTHOR_NAME_CACHE_TIMEOUT; only the
+    keys missing from the cache are fetched, concurrently.
+    """
+    if "authors" in data:
+        keys = []
+        for author_obj in data["authors"]:
+            key = author_obj.get("author", {}).get("key") or author_obj.get("key")
+            if key:
+                keys.append(key)
+
+        cached = cache.get_many([author_cache_key(key) for key in keys])
+        names = {key: cached[author_cache_key(key)] for key in keys if author_cache_key(key) in cached}
+
+        fetched = fetch_author_names([key for key in keys if key not in names])
+        if fetched:
+            cache.set_many(
+                {author_cache_key(key): name for key, name in fetched.items()},
+                timeout=settings.AUTHOR_NAME_CACHE_TIMEOUT,
+            )
+            names.update(fetched)
+
+        return [names[key] for key in dict.fromkeys(keys) if key in names]
+    elif "by_statement" in data:
+        return [data["by_statement"]]
+    elif "author_name" in data:
+        return [", ".join(data["author_name"])]
+    return []
+
+
+def fetch_book_record(olid, kind=None):
+    """
+    Fetches the raw Open Library record for an OLID.
+
+    The endpoint matching `kind` (or the kind guessed from the OLID) is tried
+    first, so edition OLIDs don't pay for a failing /works/ request.
+    Returns (kind, data), or (None, None) if neither endpoint knows the OLID.
+    """
+    kinds = ["work", "edition"]
+    if (kind or guess_kind(olid)) == "edition":
+        kinds.reverse()
+
+    for kind in kinds:
+        path = f"/works/{olid}.json" if kind == "work" else f"/books/{olid}.json"
+        data = openlibrary.get_json(path)
+        if data is not None:
+            return kind, data
+    return None, None
+
+
+def metadata_age(metadata):
+    """Returns how many seconds ago a stored row was fetched"""
+    return (timezone.now() - metadata.fetched_at).total_seconds()
+
+
+def refresh_book_metadata(olid, metadata=None):
+    """
+    Fetches an OLID from Open Library and saves it to the metadata store.
+
+    Returns the saved row, or the existing row (possibly None) if Open
+    Library can't answer.
+    """
+    if metadata is None:
+        metadata = BookMetadata.objects.filter(olid=olid).first()
+
+    kind, data = fetch_book_record(olid, kind=metadata.kind if metadata else None)
+    if data is None:
+        return metadata
+
+    # Only editions have page counts; works are left for the caller's DB fallback
+    page_count = None
+    if kind == "edition":
+        page_count = data.get("number_of_pages") or parse_pagination(data.get("pagination"))
+        if not page_count:
+            page_count = fetch_page_count(olid)
+
+    metadata, _ = BookMetadata.objects.update_or_create(
+        olid=olid,
+        defaults={
+            "kind": kind,
+            "title": (data.get("title") or "Unknown Title")[:255],
+            "authors": resolve_authors(data),
+            "description": extract_description(data),
+            "cover_id": (data.get("covers") or [None])[0],
+            "page_count": page_count,
+            "fetched_at": timezone.now(),
+        },
+    )
+    return metadata
+
+
+def get_book_metadata(olid):
+    """
+    Returns the BookMetadata for an OLID, reading through to Open Library.
+
+    Rows younger than BOOK_METADATA_TTL are served as-is. Older rows are
+    still served immediately while one background refresh per OLID updates
+    them, until they pass BOOK_METADATA_MAX_STALE; past that, or for OLIDs
+    not stored yet, the caller waits for the fetch; concurrent callers for
+    the same OLID share one fetch. Returns None if nothing is known.
+    """
+    metadata = BookMetadata.objects.filter(olid=olid).first()
+    if metadata is None:
+        return single_flight(f"book_metadata_{olid}", refresh_book_metadata, olid)
+
+    age = metadata_age(metadata)
+    if age < settings.BOOK_METADATA_TTL:
+        return metadata
+    if age < settings.BOOK_METADATA_MAX_STALE:
+        refresh_in_background(f"book_metadata_{olid}", refresh_book_metadata, olid)
+        return metadata
+    return single_flight(f"book_metadata_{olid}", refresh_book_metadata, olid)
+
+
+def get_page_counts(olids, deadline=None):
+    """
+    Returns {olid: pages} for several OLIDs.
+
+    Page counts already in the metadata store are used directly; only the
+    remaining OLIDs are looked up on Open Library.
+    """
+    olids = [olid for olid in olids if olid]
+    page_counts = dict(
+        BookMetadata.objects.filter(olid__in=olids, page_count__gt=0).values_list("olid", "page_count")
+    )
+
+    missing = [olid for olid in olids if olid not in page_counts]
+    if missing:
+        page_counts.update(fetch_page_counts(missing, deadline=deadline))
+    return page_counts
+
+
+def get_page_count(olid):
+    """
+    Returns the page count of a single OLID, or None if unknown.
+
+    Uses the metadata store when it has one; otherwise concurrent lookups
+    for the same OLID share one Open Library fetch.
+    """
+    metadata = BookMetadata.objects.filter(olid=olid, page_count__gt=0).only("page_count").first()
+    if metadata:
+        return metadata.page_count
+    return single_flight(f"page_count_{olid}", fetch_page_count, olid)
@@ -0,0 +1,18 @@
+from django.conf import settings
+
+from . import openlibrary
+
+
+class OpenLibraryBudgetMiddleware:
+    """
+    Gives every incoming request a total time budget for its Open Library
+    calls (OPENLIBRARY_REQUEST_BUDGET), so a slow Open Library can't hold a
+    worker for the sum of many timeouts.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with openlibrary.budget(settings.OPENLIBRARY_REQUEST_BUDGET):
+            return self.get_response(request)
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:24
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0011_purchase'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookMetadata',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('olid', models.CharField(max_length=50, unique=True)),
+                ('kind', models.CharField(choices=[('work', 'Work'), ('edition', 'Edition')], max_length=10)),
+                ('title', models.CharField(max_length=255)),
+                ('authors', models.JSONField(blank=True, default=list)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('cover_id', models.BigIntegerField(blank=True, null=True)),
+                ('page_count', models.IntegerField(blank=True, null=True)),
+                ('fetched_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
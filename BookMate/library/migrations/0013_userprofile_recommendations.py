@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0012_bookmetadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='recommendations_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='recommended_books',
+            field=models.JSONField(blank=True, default=list, help_text='Precomputed dashboard recommendations, refreshed in the background'),
+        ),
+    ]
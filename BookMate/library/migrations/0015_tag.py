@@ -0,0 +1,56 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_tags_to_tag_table(apps, schema_editor):
+    """Creates Tag rows and links for the existing comma-separated tags"""
+    UserBookList = apps.get_model('library', 'UserBookList')
+    Tag = apps.get_model('library', 'Tag')
+    Through = UserBookList.tag_set.through
+
+    books = UserBookList.objects.exclude(tags__isnull=True).exclude(tags='').only('id', 'user_id', 'tags')
+    for book in books.iterator(chunk_size=2000):
+        names = list(dict.fromkeys(tag.strip()[:100] for tag in book.tags.split(',') if tag.strip()))
+        if not names:
+            continue
+        Tag.objects.bulk_create([Tag(user_id=book.user_id, name=name) for name in names], ignore_conflicts=True)
+        tag_ids = Tag.objects.filter(user_id=book.user_id, name__in=names).values_list('id', flat=True)
+        Through.objects.bulk_create(
+            [Through(userbooklist_id=book.id, tag_id=tag_id) for tag_id in tag_ids],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0014_job'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='library_tags', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='userbooklist',
+            name='tag_set',
+            field=models.ManyToManyField(blank=True, related_name='books', to='library.tag'),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='unique_user_tag'),
+        ),
+        migrations.RunPython(copy_tags_to_tag_table, migrations.RunPython.noop),
+    ]
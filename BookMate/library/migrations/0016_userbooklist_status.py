@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_status(apps, schema_editor):
+    """Computes the status of existing books from their progress"""
+    UserBookList = apps.get_model('library', 'UserBookList')
+    UserBookList.objects.update(status=models.Case(
+        models.When(pages__gt=0, current_page__gte=models.F('pages'), then=models.Value('finished')),
+        models.When(current_page__gt=0, then=models.Value('reading')),
+        default=models.Value('to_read'),
+        output_field=models.CharField(),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0015_tag'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userbooklist',
+            name='status',
+            field=models.CharField(choices=[('to_read', 'To Read'), ('reading', 'Reading'), ('finished', 'Finished')], default='to_read', help_text='Reading status derived from current_page and pages, kept up to date on save', max_length=10),
+        ),
+        migrations.RunPython(backfill_status, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='userbooklist',
+            index=models.Index(fields=['user', 'status'], name='userbook_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userbooklist',
+            index=models.Index(fields=['user', 'is_favorite'], name='userbook_user_favorite_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userbooklist',
+            index=models.Index(fields=['user', 'title'], name='userbook_user_title_idx'),
+        ),
+    ]
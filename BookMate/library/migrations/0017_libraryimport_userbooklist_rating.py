@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0016_userbooklist_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userbooklist',
+            name='rating',
+            field=models.PositiveSmallIntegerField(blank=True, help_text="User's 1-5 star rating", null=True),
+        ),
+        migrations.CreateModel(
+            name='LibraryImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_path', models.CharField(max_length=500)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('processed_rows', models.IntegerField(default=0)),
+                ('imported_books', models.IntegerField(default=0)),
+                ('skipped_rows', models.IntegerField(default=0)),
+                ('errors', models.JSONField(blank=True, default=list, help_text='First few row errors, for the user')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='library_imports', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0017_libraryimport_userbooklist_rating'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.SlugField(help_text='Stable name used in reader URLs', max_length=100, unique=True)),
+                ('name', models.CharField(help_text='Path of the current version in book storage', max_length=500)),
+                ('content_type', models.CharField(default='application/pdf', max_length=100)),
+                ('size', models.BigIntegerField()),
+                ('sha256', models.CharField(help_text='Content hash, used as the strong ETag and version', max_length=64)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0018_bookfile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookfile',
+            name='page_count',
+            field=models.IntegerField(blank=True, help_text='Set once the current version is split into pages', null=True),
+        ),
+        migrations.CreateModel(
+            name='BookPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(help_text='Content hash of the book file version', max_length=64)),
+                ('number', models.IntegerField()),
+                ('text', models.TextField(blank=True)),
+                ('image_name', models.CharField(blank=True, help_text='Content-addressed render in book storage', max_length=200, null=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('sha256', 'number'), name='unique_book_page')],
+            },
+        ),
+    ]
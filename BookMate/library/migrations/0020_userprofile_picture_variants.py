@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0019_bookpage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='profile_picture_variants',
+            field=models.JSONField(blank=True, default=dict, help_text='URLs of the resized profile picture, by size (small, medium, large)'),
+        ),
+    ]
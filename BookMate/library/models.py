@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import connection, models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 
@@ -18,11 +18,33 @@ class UserProfile(models.Model):
         null=True,
         help_text="URL to profile picture stored in Supabase bucket"
     )
+    profile_picture_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="URLs of the resized profile picture, by size (small, medium, large)"
+    )
+    recommended_books = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Precomputed dashboard recommendations, refreshed in the background"
+    )
+    recommendations_updated_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
         return f"{self.user.username}'s Profile"
     
+    def get_profile_picture_url(self, size='medium'):
+        """Returns the profile picture URL at a size, falling back to the original upload"""
+        return self.profile_picture_variants.get(size) or self.profile_picture_url
+
+    def get_profile_picture_srcset(self):
+        """Returns an <img srcset> value listing every stored size"""
+        from .avatars import AVATAR_SIZES  # keeps Pillow out of model imports
+        return ", ".join(
+            f"{url} {AVATAR_SIZES[size]}w" for size, url in self.profile_picture_variants.items() if size in AVATAR_SIZES
+        )
+
     def get_favorite_genres_list(self):
         """Returns favorite genres as a list"""
         if self.favorite_genres:
@@ -30,8 +52,34 @@ class UserProfile(models.Model):
         return []
 
 
+# Tag model, one row per distinct tag name per user
+class Tag(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='library_tags')
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='unique_user_tag')
+        ]
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def names_for_user(cls, user):
+        """Returns the sorted distinct tag names used in a user's library"""
+        return list(cls.objects.filter(user=user, books__isnull=False).distinct().values_list('name', flat=True))
+
+
 #User book list model
 class UserBookList(models.Model):
+    STATUS_CHOICES = [
+        ('to_read', 'To Read'),
+        ('reading', 'Reading'),
+        ('finished', 'Finished'),
+    ]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='book_list')
     title = models.CharField(max_length=255)
     author = models.CharField(max_length=255, blank=True, null=True)
@@ -41,17 +89,30 @@ class UserBookList(models.Model):
     description = models.TextField(blank=True, null=True)
     is_favorite = models.BooleanField(default=False)
     current_page = models.IntegerField(default=0)
+    rating = models.PositiveSmallIntegerField(null=True, blank=True, help_text="User's 1-5 star rating")
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='to_read',
+        help_text="Reading status derived from current_page and pages, kept up to date on save"
+    )
     tags = models.CharField(
         max_length=500,
         blank=True,
         null=True,
         help_text="Comma-separated custom tags (e.g., 'School, Romance, Adventure')"
     )
+    tag_set = models.ManyToManyField(Tag, related_name='books', blank=True)
 
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=['user', 'olid'], name='unique_user_book')
         ]
+        indexes = [
+            models.Index(fields=['user', 'status'], name='userbook_user_status_idx'),
+            models.Index(fields=['user', 'is_favorite'], name='userbook_user_favorite_idx'),
+            models.Index(fields=['user', 'title'], name='userbook_user_title_idx'),
+        ]
         ordering = ['title']  # optional but makes admin panel neater
 
     def __str__(self):
@@ -64,8 +125,135 @@ class UserBookList(models.Model):
         return []
     
     def set_tags_list(self, tags_list):
-        """Sets tags from a list"""
+        """Sets tags from a list; the Tag rows are synced on the next save()"""
+        tags_list = list(dict.fromkeys(tag.strip() for tag in tags_list or [] if tag.strip()))
         self.tags = ", ".join(tags_list) if tags_list else ""
+        self._pending_tags = tags_list
+
+    @staticmethod
+    def compute_status(current_page, pages):
+        """Returns the reading status for a position in a book"""
+        if pages and pages > 0 and current_page >= pages:
+            return 'finished'
+        if current_page and current_page > 0:
+            return 'reading'
+        return 'to_read'
+
+    @staticmethod
+    def status_expression(current_page=None):
+        """
+        The same rule as compute_status() as a database expression, for
+        queryset.update() calls that change current_page or pages.
+
+        Pass `current_page` when the same UPDATE sets it, since the SET
+        clause would otherwise compare against the old column value.
+        """
+        if current_page is not None:
+            if current_page <= 0:
+                return models.Value('to_read')
+            return models.Case(
+                models.When(pages__gt=0, pages__lte=current_page, then=models.Value('finished')),
+                default=models.Value('reading'),
+                output_field=models.CharField(),
+            )
+        return models.Case(
+            models.When(pages__gt=0, current_page__gte=models.F('pages'), then=models.Value('finished')),
+            models.When(current_page__gt=0, then=models.Value('reading')),
+            default=models.Value('to_read'),
+            output_field=models.CharField(),
+        )
+
+    def save(self, *args, **kwargs):
+        self.status = self.compute_status(self.current_page, self.pages)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'current_page', 'pages'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'status'}
+        super().save(*args, **kwargs)
+        pending_tags = getattr(self, '_pending_tags', None)
+        if pending_tags is not None:
+            self.sync_tags(pending_tags)
+            self._pending_tags = None
+
+    @classmethod
+    def update_returning(cls, user_id, olid, assignments, params, returning):
+        """
+        Runs `UPDATE ... SET <assignments> WHERE user, olid RETURNING <returning>`
+        as a single statement and returns the new row values, or None if the
+        user has no such book.
+
+        `assignments` is SQL over this table's own columns. Backends without
+        UPDATE ... RETURNING fall back to an UPDATE and a SELECT in one
+        transaction.
+        """
+        table = connection.ops.quote_name(cls._meta.db_table)
+        columns = ", ".join(connection.ops.quote_name(column) for column in returning)
+        sql = f"UPDATE {table} SET {assignments} WHERE user_id = %s AND olid = %s"
+
+        if connection.vendor in ('postgresql', 'sqlite'):
+            with connection.cursor() as cursor:
+                cursor.execute(f"{sql} RETURNING {columns}", [*params, user_id, olid])
+                return cursor.fetchone()
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, [*params, user_id, olid])
+            cursor.execute(f"SELECT {columns} FROM {table} WHERE user_id = %s AND olid = %s", [user_id, olid])
+            return cursor.fetchone()
+
+    @classmethod
+    def toggle_favorite(cls, user_id, olid):
+        """Flips is_favorite in one statement; returns the new value, or None if not found"""
+        row = cls.update_returning(user_id, olid, "is_favorite = NOT is_favorite", [], ['is_favorite'])
+        return bool(row[0]) if row else None
+
+    @classmethod
+    def set_progress(cls, user_id, olid, page):
+        """Saves a page position and its status with one UPDATE; returns False if not found"""
+        return cls.objects.filter(user_id=user_id, olid=olid).update(
+            current_page=page,
+            status=cls.status_expression(current_page=page),
+        ) > 0
+
+    @classmethod
+    def replace_tags(cls, user_id, olid, tags_list):
+        """
+        Sets a book's tags with one UPDATE of the tags column plus the Tag
+        link sync; returns the stored tag list, or None if not found.
+        """
+        tags_list = list(dict.fromkeys(tag.strip() for tag in tags_list or [] if tag.strip()))
+        row = cls.update_returning(user_id, olid, "tags = %s", [", ".join(tags_list)], ['id'])
+        if row is None:
+            return None
+        cls.bulk_sync_tags(user_id, {row[0]: tags_list})
+        return tags_list
+
+    def sync_tags(self, tags_list):
+        """Links this book to the user's Tag rows for tags_list, creating missing ones"""
+        UserBookList.bulk_sync_tags(self.user_id, {self.pk: tags_list})
+
+    @staticmethod
+    def bulk_sync_tags(user_id, tags_by_book):
+        """
+        Replaces the Tag links of several of a user's books at once.
+
+        `tags_by_book` maps book ids to tag name lists. Uses a fixed number
+        of queries however many books are given.
+        """
+        names = {tag[:100] for tags_list in tags_by_book.values() for tag in tags_list}
+        Tag.objects.bulk_create([Tag(user_id=user_id, name=name) for name in names], ignore_conflicts=True)
+        tag_ids = dict(Tag.objects.filter(user_id=user_id, name__in=names).values_list('name', 'id'))
+
+        Through = UserBookList.tag_set.through
+        Through.objects.filter(userbooklist_id__in=tags_by_book.keys()).delete()
+        Through.objects.bulk_create(
+            [
+                Through(userbooklist_id=book_id, tag_id=tag_ids[tag[:100]])
+                for book_id, tags_list in tags_by_book.items()
+                for tag in dict.fromkeys(tags_list)
+            ],
+            ignore_conflicts=True,
+        )
+        # Drop tags no book uses any more
+        Tag.objects.filter(user_id=user_id, books__isnull=True).delete()
 
 
 # Purchase model to track book purchases
@@ -103,6 +291,136 @@ class Purchase(models.Model):
     
     def __str__(self):
         return f"{self.user.username} - {self.book_title} (${self.price})"
-    
 
 
+# Open Library metadata shared by all users, keyed by OLID
+class BookMetadata(models.Model):
+    KIND_CHOICES = [
+        ('work', 'Work'),
+        ('edition', 'Edition'),
+    ]
+
+    olid = models.CharField(max_length=50, unique=True)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    title = models.CharField(max_length=255)
+    authors = models.JSONField(default=list, blank=True)
+    description = models.TextField(blank=True, null=True)
+    cover_id = models.BigIntegerField(null=True, blank=True)
+    page_count = models.IntegerField(null=True, blank=True)
+    fetched_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.title} ({self.olid})"
+
+    @property
+    def cover_url(self):
+        """Returns the large Open Library cover URL, if the book has a cover"""
+        if self.cover_id:
+            return f"https://covers.openlibrary.org/b/id/{self.cover_id}-L.jpg"
+        return None
+
+
+# Background job queue, run by `python manage.py run_worker`
+class Job(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True)
+    dedupe_key = models.CharField(
+        max_length=255,
+        blank=True,
+        null=True,
+        help_text="Only one pending or running job may exist per key"
+    )
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedupe_key'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='unique_active_job'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
+# Library import from an uploaded CSV (Goodreads export or plain title/author/ISBN)
+class LibraryImport(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='library_imports')
+    file_path = models.CharField(max_length=500)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    processed_rows = models.IntegerField(default=0)
+    imported_books = models.IntegerField(default=0)
+    skipped_rows = models.IntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True, help_text="First few row errors, for the user")
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.user.username} import #{self.pk} ({self.status})"
+
+
+# A readable book file (PDF) kept in the book storage backend
+class BookFile(models.Model):
+    key = models.SlugField(max_length=100, unique=True, help_text="Stable name used in reader URLs")
+    name = models.CharField(max_length=500, help_text="Path of the current version in book storage")
+    content_type = models.CharField(max_length=100, default='application/pdf')
+    size = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64, help_text="Content hash, used as the strong ETag and version")
+    page_count = models.IntegerField(null=True, blank=True, help_text="Set once the current version is split into pages")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.key} ({self.size} bytes)"
+
+    @property
+    def etag(self):
+        return f'"{self.sha256}"'
+
+    @property
+    def version(self):
+        return self.sha256[:16]
+
+
+# One page of a book file version, extracted once by the split_book_file job
+class BookPage(models.Model):
+    sha256 = models.CharField(max_length=64, help_text="Content hash of the book file version")
+    number = models.IntegerField()
+    text = models.TextField(blank=True)
+    image_name = models.CharField(max_length=200, null=True, blank=True, help_text="Content-addressed render in book storage")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['sha256', 'number'], name='unique_book_page')
+        ]
+
+    def __str__(self):
+        return f"{self.sha256[:16]} page {self.number}"
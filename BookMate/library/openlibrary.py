@@ -0,0 +1,432 @@
+import contextvars
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+from django.core.cache import cache
+
+
+OPENLIBRARY_URL = "https://openlibrary.org"
+COVERS_URL = "https://covers.openlibrary.org"
+BOOKS_API_BATCH_SIZE = 50  # bibkeys per Books API call
+RETRY_STATUSES = (429, 500, 502, 503, 504)  # responses worth another try (and counted by the breaker)
+
+# Endpoint classes share a circuit breaker; the first matching path prefix wins
+ENDPOINT_CLASSES = (
+    ("/search.json", "search"),
+    ("/api/books", "books_api"),
+    ("/books/", "records"),
+    ("/works/", "records"),
+    ("/authors/", "authors"),
+)
+
+_sessions = {}
+_session_pid = None
+_session_lock = threading.Lock()
+
+# Monotonic time by which the current request's outbound calls must finish
+_deadline = contextvars.ContextVar("openlibrary_deadline", default=None)
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of calling an endpoint class whose circuit breaker is open"""
+
+
+class BudgetExhaustedError(requests.RequestException):
+    """Raised instead of calling Open Library once the request's time budget is spent"""
+
+
+def get_session(retries=True):
+    """
+    Returns the keep-alive requests session shared by this worker process.
+
+    The session is created lazily and re-created after a fork, so every
+    gunicorn worker gets its own connection pool. Idempotent GETs are
+    retried with backoff on connection errors and 429/5xx responses;
+    retries=False returns a session that makes one attempt only, for calls
+    running against a time budget (get() retries those itself).
+    """
+    global _sessions, _session_pid
+    if retries not in _sessions or _session_pid != os.getpid():
+        with _session_lock:
+            if _session_pid != os.getpid():
+                _sessions, _session_pid = {}, os.getpid()
+            if retries not in _sessions:
+                retry = Retry(
+                    total=settings.OPENLIBRARY_RETRIES if retries else 0,
+                    backoff_factor=0.3,
+                    status_forcelist=RETRY_STATUSES,
+                    allowed_methods=["GET"],
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=4,
+                    pool_maxsize=settings.OPENLIBRARY_MAX_WORKERS,
+                    max_retries=retry,
+                )
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _sessions[retries] = session
+    return _sessions[retries]
+
+
+# --- TIME BUDGET ---
+@contextmanager
+def budget(seconds):
+    """
+    Caps the total time Open Library calls made inside the block may take.
+
+    Every call's timeouts are shortened to what is left of the budget, and
+    calls made once it is spent raise BudgetExhaustedError without touching
+    the network. Nested budgets keep the tighter deadline.
+    """
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def time_left():
+    """Returns the seconds left in the current budget, or None if there is none"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def with_budget(func):
+    """Wraps func so it runs under the caller's budget when handed to a thread pool"""
+    deadline = _deadline.get()
+
+    def run(*args, **kwargs):
+        token = _deadline.set(deadline)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _deadline.reset(token)
+    return run
+
+
+# --- CIRCUIT BREAKER ---
+def endpoint_class(url):
+    """Returns the breaker name for an Open Library URL or path (e.g. "search", "covers")"""
+    if url.startswith(COVERS_URL):
+        return "covers"
+    path = url[len(OPENLIBRARY_URL):] if url.startswith(OPENLIBRARY_URL) else url
+    for prefix, name in ENDPOINT_CLASSES:
+        if path.startswith(prefix):
+            return name
+    return "other"
+
+
+def circuit_open(name):
+    """
+    True while an endpoint class's breaker is open or half-open, i.e. when
+    callers should prefer cached or stored data over a fresh fetch.
+    """
+    return bool(cache.get_many([f"ol_circuit_open_{name}", f"ol_circuit_tripped_{name}"]))
+
+
+def check_circuit(name):
+    """
+    Raises CircuitOpenError if calls to an endpoint class should fail fast.
+
+    The breaker state lives in the cache, so every worker sees it. After the
+    cooldown the breaker is half-open: one probe call at a time is let
+    through, and its outcome closes the breaker or re-opens it.
+    """
+    state = cache.get_many([f"ol_circuit_open_{name}", f"ol_circuit_tripped_{name}"])
+    if f"ol_circuit_open_{name}" in state:
+        raise CircuitOpenError(f"Open Library {name} circuit is open")
+    if f"ol_circuit_tripped_{name}" in state:
+        probe_timeout = settings.OPENLIBRARY_CONNECT_TIMEOUT + settings.OPENLIBRARY_TIMEOUT
+        if not cache.add(f"ol_circuit_probe_{name}", True, timeout=probe_timeout):
+            raise CircuitOpenError(f"Open Library {name} circuit is half-open and already probing")
+
+
+def record_failure(name):
+    """Counts a failed call; opens the breaker past the threshold, or at once after a failed probe"""
+    failures_key = f"ol_circuit_failures_{name}"
+    cache.add(failures_key, 0, timeout=settings.OPENLIBRARY_BREAKER_WINDOW)
+    try:
+        failures = cache.incr(failures_key)
+    except ValueError:  # the window expired between add() and incr()
+        failures = 1
+    if failures >= settings.OPENLIBRARY_BREAKER_THRESHOLD or cache.get(f"ol_circuit_tripped_{name}"):
+        cache.set(f"ol_circuit_open_{name}", True, timeout=settings.OPENLIBRARY_BREAKER_COOLDOWN)
+        cache.set(f"ol_circuit_tripped_{name}", True, timeout=settings.OPENLIBRARY_BREAKER_COOLDOWN * 10)
+        cache.delete_many([failures_key, f"ol_circuit_probe_{name}"])
+        print(f"⚠️ Open Library {name} circuit opened after {failures} failure(s)")
+
+
+def record_success(name):
+    """Closes a half-open breaker once a call succeeds"""
+    if cache.get(f"ol_circuit_tripped_{name}"):
+        cache.delete_many([f"ol_circuit_tripped_{name}", f"ol_circuit_failures_{name}", f"ol_circuit_probe_{name}"])
+        print(f"✅ Open Library {name} circuit closed")
+
+
+def send(name, url, params=None, timeout=None, retries=True):
+    """
+    Makes one GET (plus urllib3's retries when `retries` is set) within the
+    current time budget and records its outcome on the breaker.
+    """
+    connect_timeout = settings.OPENLIBRARY_CONNECT_TIMEOUT
+    read_timeout = timeout or settings.OPENLIBRARY_TIMEOUT
+    left = time_left()
+    budget_limited = False
+    if left is not None:
+        if left <= 0:
+            raise BudgetExhaustedError(f"No time left in the request budget for Open Library {name}")
+        budget_limited = left < read_timeout
+        connect_timeout, read_timeout = min(connect_timeout, left), min(read_timeout, left)
+
+    try:
+        response = get_session(retries=retries).get(url, params=params, timeout=(connect_timeout, read_timeout))
+    except requests.Timeout:
+        # A timeout we shortened ourselves says nothing about Open Library's health
+        if not budget_limited:
+            record_failure(name)
+        raise
+    except requests.RequestException:
+        record_failure(name)
+        raise
+
+    if response.status_code >= 500 or response.status_code == 429:
+        record_failure(name)
+    else:
+        record_success(name)
+    return response
+
+
+def can_retry():
+    """True while the current budget still has room for another connect"""
+    left = time_left()
+    return left is not None and left > settings.OPENLIBRARY_CONNECT_TIMEOUT
+
+
+def get(path, params=None, timeout=None):
+    """
+    Sends a GET to Open Library through the pooled session.
+
+    `path` is relative to OPENLIBRARY_URL (e.g. "/search.json"), or a full
+    covers URL, and query values go in `params` so they are escaped
+    properly. Calls go through their endpoint class's circuit breaker and
+    the current time budget. Outside a budget (worker jobs) failed calls
+    get OPENLIBRARY_RETRIES retries with backoff; within one, a single
+    immediate retry while the budget still allows it. Raises
+    requests.RequestException on network errors, CircuitOpenError while
+    the breaker is open and BudgetExhaustedError once the budget is spent.
+    """
+    url = path if path.startswith(COVERS_URL) else f"{OPENLIBRARY_URL}{path}"
+    name = endpoint_class(url)
+    check_circuit(name)
+    if time_left() is None:
+        return send(name, url, params, timeout)
+
+    # urllib3's retries can't see the budget, so budgeted calls retry here
+    try:
+        response = send(name, url, params, timeout, retries=False)
+    except BudgetExhaustedError:
+        raise
+    except requests.RequestException:
+        if not can_retry():
+            raise
+        check_circuit(name)
+        return send(name, url, params, timeout, retries=False)
+    if response.status_code in RETRY_STATUSES and can_retry():
+        check_circuit(name)
+        return send(name, url, params, timeout, retries=False)
+    return response
+
+
+def get_json(path, params=None, timeout=None):
+    """Returns the decoded JSON body of a GET, or None on any error or non-200 status"""
+    try:
+        response = get(path, params=params, timeout=timeout)
+        if response.status_code != 200:
+            return None
+        return response.json()
+    except (requests.RequestException, ValueError):
+        return None
+
+
+def parse_pagination(pagination):
+    """Returns the last number in a pagination string (e.g. "xii, 350 p.")"""
+    if not pagination:
+        return None
+    digits = re.findall(r"\d+", pagination)
+    return int(digits[-1]) if digits else None
+
+
+def fetch_books_data(book_ids, timeout=None, id_type="OLID"):
+    """
+    Fetches Books API (jscmd=data) records for several identifiers.
+
+    The Books API accepts many bibkeys per call, so identifiers (OLIDs by
+    default, or ISBNs with id_type="ISBN") are sent in chunks of
+    BOOKS_API_BATCH_SIZE and the response is split back out per identifier.
+    Returns {identifier: data} for the keys the API answered.
+    """
+    book_ids = list(dict.fromkeys(book_id for book_id in book_ids if book_id))
+    books_data = {}
+
+    for i in range(0, len(book_ids), BOOKS_API_BATCH_SIZE):
+        chunk = book_ids[i:i + BOOKS_API_BATCH_SIZE]
+        bibkeys = ",".join(f"{id_type}:{book_id}" for book_id in chunk)
+        api_data = get_json(
+            "/api/books",
+            params={"bibkeys": bibkeys, "jscmd": "data", "format": "json"},
+            timeout=timeout,
+        )
+        if not api_data:
+            continue
+
+        for book_id in chunk:
+            if api_data.get(f"{id_type}:{book_id}"):
+                books_data[book_id] = api_data[f"{id_type}:{book_id}"]
+
+    return books_data
+
+
+def fetch_books_by_isbn(isbns):
+    """
+    Looks up several ISBNs with batched, concurrent Books API calls.
+
+    Returns {isbn: data}, where data is the Books API jscmd=data record and
+    data["key"] is the edition key (e.g. "/books/OL7353617M").
+    """
+    isbns = list(dict.fromkeys(isbn for isbn in isbns if isbn))
+    chunks = [isbns[i:i + BOOKS_API_BATCH_SIZE] for i in range(0, len(isbns), BOOKS_API_BATCH_SIZE)]
+    if not chunks:
+        return {}
+
+    books_data = {}
+    with ThreadPoolExecutor(max_workers=min(settings.OPENLIBRARY_MAX_WORKERS, len(chunks))) as executor:
+        for chunk_data in executor.map(with_budget(lambda chunk: fetch_books_data(chunk, id_type="ISBN")), chunks):
+            books_data.update(chunk_data)
+    return books_data
+
+
+def search_edition(title, author=None):
+    """
+    Returns the best-matching search doc for a title (and author), or None.
+
+    The doc includes cover_edition_key / edition_key and number_of_pages_median.
+    """
+    params = {"title": title, "limit": 1, "fields": "title,author_name,cover_edition_key,edition_key,number_of_pages_median,cover_i"}
+    if author:
+        params["author"] = author
+    data = get_json("/search.json", params=params)
+    docs = data.get("docs") if data else None
+    return docs[0] if docs else None
+
+
+def fetch_edition_page_count(olid, timeout=None):
+    """Returns the page count from an edition record (/books/{olid}.json), or None"""
+    edition_data = get_json(f"/books/{olid}.json", timeout=timeout)
+    if not edition_data:
+        return None
+    return edition_data.get("number_of_pages") or parse_pagination(edition_data.get("pagination"))
+
+
+def fetch_page_counts(olids, deadline=None):
+    """
+    Looks up page counts for several OLIDs.
+
+    All OLIDs are first resolved through one batched Books API call; only the
+    ones it didn't answer fall back to per-edition lookups, which run
+    concurrently on a bounded thread pool. Any OLID still unresolved after
+    `deadline` seconds (or whose lookup failed) is reported as 0 so a slow
+    edition never holds up the caller. The deadline never outlasts the
+    current request budget.
+    """
+    olids = list(dict.fromkeys(olid for olid in olids if olid))
+    if not olids:
+        return {}
+
+    deadline = deadline if deadline is not None else settings.OPENLIBRARY_SEARCH_DEADLINE
+    left = time_left()
+    if left is not None:
+        deadline = min(deadline, left)
+    if deadline <= 0:
+        return {olid: 0 for olid in olids}
+    started = time.monotonic()
+
+    # 1) Batched Books API jscmd=data (best source)
+    books_data = fetch_books_data(olids, timeout=min(settings.OPENLIBRARY_TIMEOUT, deadline))
+    page_counts = {olid: books_data.get(olid, {}).get("number_of_pages") or 0 for olid in olids}
+
+    # 2) Edition fallback, only for keys the batch didn't answer
+    missing = [olid for olid in olids if not page_counts[olid]]
+    remaining = deadline - (time.monotonic() - started)
+    if not missing or remaining <= 0:
+        return page_counts
+
+    executor = ThreadPoolExecutor(max_workers=min(settings.OPENLIBRARY_MAX_WORKERS, len(missing)))
+    try:
+        futures = {executor.submit(with_budget(fetch_edition_page_count), olid): olid for olid in missing}
+        done, _ = wait(futures, timeout=remaining)
+    finally:
+        # Don't wait for stragglers; their own socket timeouts will end them
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    for future, olid in futures.items():
+        if future in done and future.exception() is None:
+            page_counts[olid] = future.result() or 0
+    return page_counts
+
+
+def fetch_page_count(olid):
+    """Returns the page count of a single edition OLID, or None if unknown"""
+    return fetch_page_counts([olid]).get(olid) or None
+
+
+def fetch_cover(kind, key, size):
+    """
+    Returns the bytes of a cover image (e.g. kind="olid", key="OL7353617M",
+    size="M"), or None if Open Library has no cover for it.
+
+    Raises requests.RequestException on network errors and 5xx responses
+    (or while the covers circuit is open), so callers can tell a missing
+    cover from an unreachable server.
+    """
+    # default=false makes a missing cover a 404 instead of a blank placeholder image
+    response = get(f"{COVERS_URL}/b/{kind}/{key}-{size}.jpg", params={"default": "false"})
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    return response.content or None
+
+
+def fetch_author_name(key):
+    """Returns the name of an author key (e.g. "/authors/OL23919A"), or None"""
+    author_data = get_json(f"{key}.json")
+    return author_data.get("name") if author_data else None
+
+
+def fetch_author_names(keys):
+    """
+    Fetches the names of several author keys concurrently.
+
+    Returns {key: name} for the authors Open Library answered.
+    """
+    keys = list(dict.fromkeys(key for key in keys if key))
+    if not keys:
+        return {}
+    if len(keys) == 1:
+        name = fetch_author_name(keys[0])
+        return {keys[0]: name} if name else {}
+
+    with ThreadPoolExecutor(max_workers=min(settings.OPENLIBRARY_MAX_WORKERS, len(keys))) as executor:
+        names = dict(zip(keys, executor.map(with_budget(fetch_author_name), keys)))
+    return {key: name for key, name in names.items() if name}
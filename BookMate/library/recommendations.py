@@ -0,0 +1,105 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import openlibrary
+from .caching import refresh_in_background
+from .models import Tag, UserBookList, UserProfile
+
+
+def build_search_terms(favorite_genres, tags):
+    """Returns the search terms for a user's recommendations"""
+    search_terms = []
+    if favorite_genres:
+        search_terms.extend(favorite_genres[:3])
+    if tags:
+        search_terms.extend(sorted(tags)[:2])
+    return search_terms
+
+
+def compute_recommendations(user_id):
+    """
+    Builds a user's recommendations from their favourite genres and tags
+    and stores them on their UserProfile.
+
+    Runs off the request path (background thread or management command).
+    If Open Library can't answer, the previously stored list is kept.
+    """
+    profile, created = UserProfile.objects.get_or_create(user_id=user_id)
+
+    user_olids = set(UserBookList.objects.filter(user_id=user_id).values_list("olid", flat=True))
+    user_tags = Tag.names_for_user(user_id)
+
+    search_terms = build_search_terms(profile.get_favorite_genres_list(), user_tags)
+
+    recommended_books = []
+    if search_terms:
+        query = " ".join(search_terms)  # Encoded as + for better search
+        data = openlibrary.get_json("/search.json", params={"q": query, "limit": 30})
+        if data is None:
+            return profile.recommended_books
+
+        for book in data.get("docs", []):
+            if len(recommended_books) >= settings.RECOMMENDATIONS_STORED:
+                break
+
+            # Get OLID
+            olid = book.get("cover_edition_key")
+            if not olid and book.get("edition_key"):
+                olid = book.get("edition_key")[0]
+
+            # Skip if no OLID or user already has it
+            if not olid or olid in user_olids:
+                continue
+
+            recommended_books.append({
+                "title": book.get("title", "Unknown Title"),
+                "author": ", ".join(book.get("author_name", [])) if book.get("author_name") else "Unknown",
+                "cover_url": f"https://covers.openlibrary.org/b/olid/{olid}-M.jpg",
+                "olid": olid,
+                "year": book.get("first_publish_year", "Unknown"),
+            })
+
+    UserProfile.objects.filter(pk=profile.pk).update(
+        recommended_books=recommended_books,
+        recommendations_updated_at=timezone.now(),
+    )
+    return recommended_books
+
+
+def schedule_recommendations_refresh(user_id):
+    """Recomputes a user's recommendations on a background thread"""
+    return refresh_in_background(f"recommendations_{user_id}", compute_recommendations, user_id)
+
+
+def invalidate_recommendations(user_id):
+    """
+    Marks a user's recommendations as outdated (after a library or genre
+    change) and schedules a refresh. The stored list keeps being served
+    until the refresh lands.
+    """
+    UserProfile.objects.filter(user_id=user_id).update(recommendations_updated_at=None)
+    schedule_recommendations_refresh(user_id)
+
+
+def is_outdated(profile):
+    """Returns True if a profile's recommendations need recomputing"""
+    if profile.recommendations_updated_at is None:
+        return True
+    return profile.recommendations_updated_at < timezone.now() - timedelta(seconds=settings.RECOMMENDATIONS_TTL)
+
+
+def get_recommendations(user_id, profile, user_olids):
+    """
+    Returns the stored recommendations for the dashboard without touching
+    the network. Books the user has added since they were computed are
+    skipped, and an outdated list triggers a background refresh.
+    """
+    if profile is None or is_outdated(profile):
+        schedule_recommendations_refresh(user_id)
+    if profile is None:
+        return []
+
+    recommended_books = [book for book in profile.recommended_books if book.get("olid") not in user_olids]
+    return recommended_books[:settings.RECOMMENDATIONS_SHOWN]
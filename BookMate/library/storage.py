@@ -0,0 +1,107 @@
+import mimetypes
+import os
+import tempfile
+import threading
+from urllib.parse import quote, unquote
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import Storage, storages
+from django.utils.deconstruct import deconstructible
+
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_book_storage():
+    """Returns the storage backend book files live in (STORAGES["books"])"""
+    return storages["books"]
+
+
+def storage_name_from_url(storage, url):
+    """Returns the stored name behind a URL the storage produced, or None if it isn't one of its URLs"""
+    prefix = storage.url("")
+    if url and prefix and url.startswith(prefix):
+        return unquote(url[len(prefix):].split("?", 1)[0]) or None
+    return None
+
+
+def get_session():
+    """Returns this process's keep-alive session for the Supabase Storage API"""
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        with _session_lock:
+            if _session is None or _session_pid != os.getpid():
+                session = requests.Session()
+                session.mount("https://", HTTPAdapter(pool_maxsize=10))
+                _session, _session_pid = session, os.getpid()
+    return _session
+
+
+@deconstructible
+class SupabaseStorage(Storage):
+    """
+    Django storage backed by a Supabase Storage bucket, over its REST API.
+
+    Uploads stream the file in chunks (chunked transfer encoding) rather
+    than reading it into memory, and all calls share one pooled session.
+    Names are used as given: callers pick unique names, which saves the
+    existence check Django would otherwise make before every save.
+    """
+
+    def __init__(self, bucket=None, url=None, key=None, timeout=30):
+        self.bucket = bucket or settings.SUPABASE_BUCKET
+        self.base_url = (url or settings.SUPABASE_URL).rstrip("/")
+        self.key = key or settings.SUPABASE_KEY
+        self.timeout = timeout
+
+    def _object_url(self, name):
+        return f"{self.base_url}/storage/v1/object/{self.bucket}/{quote(name)}"
+
+    def _headers(self, **extra):
+        return {"Authorization": f"Bearer {self.key}", "apikey": self.key, **extra}
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        content_type = getattr(content, "content_type", None) or mimetypes.guess_type(name)[0] or "application/octet-stream"
+        response = get_session().post(
+            self._object_url(name),
+            data=content.chunks(),
+            headers=self._headers(**{"Content-Type": content_type, "x-upsert": "false"}),
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return name
+
+    def _open(self, name, mode="rb"):
+        response = get_session().get(self._object_url(name), headers=self._headers(), stream=True, timeout=self.timeout)
+        response.raise_for_status()
+        # Spooled to disk past 5MB so large objects don't sit in memory
+        spooled = tempfile.SpooledTemporaryFile(max_size=5 * 1024 * 1024)
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            spooled.write(chunk)
+        spooled.seek(0)
+        return File(spooled, name=name)
+
+    def delete(self, name):
+        response = get_session().delete(self._object_url(name), headers=self._headers(), timeout=self.timeout)
+        if response.status_code not in (200, 204, 404):
+            response.raise_for_status()
+
+    def exists(self, name):
+        response = get_session().head(self._object_url(name), headers=self._headers(), timeout=self.timeout)
+        return response.status_code == 200
+
+    def size(self, name):
+        response = get_session().head(self._object_url(name), headers=self._headers(), timeout=self.timeout)
+        response.raise_for_status()
+        return int(response.headers.get("Content-Length", 0))
+
+    def url(self, name):
+        return f"{self.base_url}/storage/v1/object/public/{self.bucket}/{quote(name)}"
@@ -0,0 +1,104 @@
+from django.core.files.storage import storages
+from django.db.models import Q
+
+from .bookpages import PdfReader, split_book_file
+from .covers import prune_covers
+from .jobs import enqueue, enqueue_many, task
+from .metadata import get_book_metadata, get_page_count
+from .models import BookFile, Job, UserBookList
+
+
+def enqueue_book_enrichment(olid):
+    """Queues a lookup of pages, description and cover for an OLID (once per OLID)"""
+    return enqueue("enrich_book", {"olid": olid}, dedupe_key=f"enrich_book_{olid}")
+
+
+def enqueue_books_enrichment(olids):
+    """Queues enrichment for several OLIDs with one INSERT"""
+    olids = list(dict.fromkeys(olids))
+    return enqueue_many(
+        "enrich_book",
+        [{"olid": olid} for olid in olids],
+        dedupe_keys=[f"enrich_book_{olid}" for olid in olids],
+    )
+
+
+@task("enrich_book")
+def enrich_book(olid):
+    """Fills in missing pages, description and cover on every library entry for an OLID"""
+    metadata = get_book_metadata(olid)
+    pages = (metadata.page_count if metadata else None) or get_page_count(olid)
+
+    if metadata is None and not pages:
+        raise ValueError(f"Open Library has no data for {olid}")
+
+    books = UserBookList.objects.filter(olid=olid)
+    if pages:
+        unknown = books.filter(Q(pages__isnull=True) | Q(pages=0))
+        # Imported "read" shelf entries are finished before their length is known
+        unknown.filter(status='finished').update(current_page=pages)
+        unknown.update(pages=pages)
+        # A known page count can finish (or un-finish) a book
+        books.update(status=UserBookList.status_expression())
+    if metadata and metadata.description:
+        books.filter(Q(description__isnull=True) | Q(description="")).update(description=metadata.description)
+    if metadata and metadata.cover_url:
+        books.filter(Q(cover_url__isnull=True) | Q(cover_url="")).update(cover_url=metadata.cover_url)
+
+
+def enqueue_library_import(import_id):
+    """Queues a CSV import; not retried, since a half-done import would be counted twice"""
+    return enqueue("import_library", {"import_id": import_id}, max_attempts=1)
+
+
+@task("import_library")
+def import_library(import_id):
+    """Streams an uploaded CSV into the user's library"""
+    from .importer import run_import  # importer queues enrichment through this module
+
+    run_import(import_id)
+
+
+def enqueue_book_split(key, sha256):
+    """
+    Queues splitting a book file's current version into per-page artifacts
+    (once per version). Does nothing without pypdf, since the job could
+    only fail; the reader then keeps using the whole PDF.
+    """
+    if PdfReader is None:
+        return None
+    return enqueue("split_book_file", {"key": key}, dedupe_key=f"split_book_file_{key}_{sha256[:16]}")
+
+
+@task("split_book_file")
+def split_book_pages(key):
+    """Extracts per-page text and renders for the reader's page-window API"""
+    split_book_file(key)
+
+
+def enqueue_file_deletion(alias, name, delay=0):
+    """Queues deleting a stored file, so callers don't wait on the storage round trip"""
+    return enqueue("delete_stored_file", {"alias": alias, "name": name}, dedupe_key=f"delete_{alias}_{name}", delay=delay)
+
+
+def cancel_file_deletion(alias, name):
+    """Drops a queued deletion of a stored file that is in use again"""
+    return Job.objects.filter(dedupe_key=f"delete_{alias}_{name}", status='pending').delete()[0]
+
+
+@task("delete_stored_file")
+def delete_stored_file(alias, name):
+    """
+    Deletes a file from one of the STORAGES backends, unless it is in use
+    again: book versions are content-addressed, so re-uploading an old
+    version brings back the very name queued for deletion.
+    """
+    if alias == "books" and BookFile.objects.filter(name=name).exists():
+        return
+    storages[alias].delete(name)
+
+
+@task("prune_covers")
+def prune_cover_cache():
+    """Keeps the on-disk cover cache under COVER_CACHE_MAX_BYTES"""
+    prune_covers()
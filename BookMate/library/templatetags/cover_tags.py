@@ -0,0 +1,11 @@
+from django import template
+
+from ..covers import local_cover_url
+
+register = template.Library()
+
+
+@register.filter
+def local_cover(url, size=None):
+    """Serves an Open Library cover through our cover cache: {{ book.cover_url|local_cover:"grid" }}"""
+    return local_cover_url(url, size)
@@ -1,3 +1,485 @@
-from django.test import TestCase
+import base64
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import caching, covers, openlibrary
+from .bookfiles import parse_range, save_book_file
+from .importer import clean_isbn, normalize_row, run_import
+from .jobs import heartbeat_jobs, requeue_stale_jobs
+from .models import BookFile, Job, LibraryImport, UserBookList
+from .tasks import delete_stored_file, enqueue_file_deletion
+
+
+class RequeueStaleJobsTests(TestCase):
+    def make_running_job(self, attempts=0, max_attempts=5, age=3600):
+        return Job.objects.create(
+            kind='test', status='running', attempts=attempts, max_attempts=max_attempts,
+            locked_at=timezone.now() - timedelta(seconds=age),
+        )
+
+    def test_stale_job_is_requeued_with_an_attempt_counted(self):
+        job = self.make_running_job()
+        requeue_stale_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_at), ('pending', 1, None))
+
+    def test_stale_job_out_of_attempts_is_failed(self):
+        job = self.make_running_job(attempts=0, max_attempts=1)
+        requeue_stale_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 1))
+
+    def test_held_and_fresh_jobs_are_left_running(self):
+        held = self.make_running_job()
+        fresh = self.make_running_job(age=0)
+        requeue_stale_jobs(held=[held.pk])
+        held.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual((held.status, fresh.status), ('running', 'running'))
+
+    def test_heartbeat_keeps_long_job_from_looking_stale(self):
+        job = self.make_running_job()
+        heartbeat_jobs([job.pk])
+        requeue_stale_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('running', 0))
+
+
+class BulkUpdateLibraryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        self.client.force_login(self.user)
+        UserBookList.objects.create(user=self.user, olid='OL1M', title='Emma', pages=100)
+
+    def bulk(self, *operations):
+        with mock.patch('library.views.enqueue_books_enrichment'), mock.patch('library.views.invalidate_recommendations'):
+            response = self.client.post(
+                '/api/library/bulk/', json.dumps({"operations": list(operations)}), content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        return response.json()["results"]
+
+    def test_invalid_items_fail_individually(self):
+        results = self.bulk(
+            {"op": "add", "olid": "OL2M", "pages": "abc"},
+            {"op": "tags", "olid": "OL1M", "tags": ["ok", 3]},
+            {"op": "progress", "olid": "OL1M", "progress": None},
+            {"op": "add", "olid": "OL3M", "title": "Persuasion", "pages": "320"},
+        )
+        self.assertEqual([result["success"] for result in results], [False, False, False, True])
+        self.assertFalse(UserBookList.objects.filter(olid='OL2M').exists())
+        self.assertEqual(UserBookList.objects.get(olid='OL3M').pages, 320)
+
+    def test_oversized_and_mistyped_items_fail_individually(self):
+        results = self.bulk(
+            {"op": "add", "olid": "OL" + "1" * 60 + "M", "title": "Long"},
+            {"op": "add", "olid": "OL4M", "title": "x" * 256},
+            {"op": "add", "olid": "OL5M", "title": "Big", "pages": 2 ** 31},
+            {"op": "progress", "olid": "OL1M", "progress": 10 ** 12},
+            {"op": "tags", "olid": "OL1M", "tags": ["t" * 100] * 2 + ["u" * 300, "v" * 100]},
+            {"op": "favorite", "olid": "OL1M", "is_favorite": "false"},
+            {"op": "favorite", "olid": "OL1M", "is_favorite": False},
+        )
+        self.assertEqual([result["success"] for result in results], [False] * 6 + [True])
+        self.assertEqual(UserBookList.objects.filter(user=self.user).count(), 1)
+        book = UserBookList.objects.get(olid='OL1M')
+        self.assertEqual((book.is_favorite, book.current_page, book.get_tags_list()), (False, 0, []))
+
+    def test_negative_progress_is_clamped(self):
+        results = self.bulk({"op": "progress", "olid": "OL1M", "progress": -5})
+        self.assertEqual(results[0]["progress"], 0)
+        book = UserBookList.objects.get(olid='OL1M')
+        self.assertEqual((book.current_page, book.status), (0, 'to_read'))
+
+
+class ImportRowTests(TestCase):
+    def test_clean_isbn(self):
+        self.assertEqual(clean_isbn('="0439023483"'), '0439023483')
+        self.assertEqual(clean_isbn('="9780439023481"'), '9780439023481')
+        self.assertEqual(clean_isbn('080442957x'), '080442957X')
+        self.assertEqual(clean_isbn('978-0-439-02348-1'), '9780439023481')
+        self.assertIsNone(clean_isbn('=""'))
+        self.assertIsNone(clean_isbn('12345'))
+        self.assertIsNone(clean_isbn(None))
+
+    def test_goodreads_row(self):
+        entry = normalize_row({
+            'Title': ' The Hunger Games ', 'Author': 'Suzanne Collins', 'ISBN': '="0439023483"',
+            'ISBN13': '="9780439023481"', 'My Rating': '4', 'Number of Pages': '374',
+            'Exclusive Shelf': 'read', 'Bookshelves': 'favorites, dystopia, read',
+        })
+        self.assertEqual(entry, {
+            'title': 'The Hunger Games', 'author': 'Suzanne Collins', 'olid': None,
+            'isbns': ['9780439023481', '0439023483'], 'pages': 374, 'status': 'finished',
+            'current_page': 0, 'rating': 4, 'is_favorite': True, 'tags': ['dystopia'],
+        })
+
+    def test_plain_row(self):
+        entry = normalize_row({
+            'olid': 'OL1M', 'title': '', 'pages': '300.0', 'status': 'reading',
+            'current_page': '12', 'rating': '0', 'tags': 'classics', 'is_favorite': 'true',
+        })
+        self.assertEqual(entry['title'], 'Unknown Title')
+        self.assertEqual((entry['olid'], entry['pages'], entry['status'], entry['current_page']), ('OL1M', 300, 'reading', 12))
+        self.assertEqual((entry['rating'], entry['is_favorite'], entry['tags']), (None, True, ['classics']))
+
+    def test_unknown_values_fall_back(self):
+        entry = normalize_row({'Title': 'Emma', 'Exclusive Shelf': 'abandoned', 'Number of Pages': 'n/a', 'My Rating': '9'})
+        self.assertEqual((entry['status'], entry['pages'], entry['rating'], entry['author']), ('to_read', 0, None, None))
+
+    def test_row_without_title_or_olid_is_skipped(self):
+        self.assertIsNone(normalize_row({'Title': '  ', 'Author': 'Nobody', None: 'stray'}))
+
+    def test_malformed_olid_is_rejected(self):
+        for olid in ('OL1X', '../OL1M', 'OL' + '1' * 60 + 'M'):
+            with self.assertRaises(ValueError):
+                normalize_row({'olid': olid, 'title': 'Emma'})
+        self.assertEqual(normalize_row({'olid': 'OL45W', 'title': 'Emma'})['olid'], 'OL45W')
+
+    def test_import_skips_rows_with_malformed_olid(self):
+        user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as csv_file:
+            csv_file.write('olid,title\nOL1M,Emma\nnot-an-olid,Persuasion\n')
+        library_import = LibraryImport.objects.create(user=user, file_path=csv_file.name)
+        with mock.patch('library.importer.enqueue_books_enrichment'):
+            run_import(library_import.pk)
+        library_import.refresh_from_db()
+        self.assertEqual((library_import.imported_books, library_import.skipped_rows), (1, 1))
+        self.assertEqual(library_import.errors, ["Invalid OLID 'not-an-olid'"])
+        self.assertEqual(list(UserBookList.objects.values_list('olid', flat=True)), ['OL1M'])
+
+
+class UpdateProgressTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        self.client.force_login(self.user)
+        UserBookList.objects.create(user=self.user, olid='OL1M', title='Emma', pages=100)
+
+    def post_progress(self, olid, progress):
+        return self.client.post('/api/update_progress/', json.dumps({"olid": olid, "progress": progress}), content_type='application/json')
+
+    def test_each_update_is_one_targeted_update(self):
+        self.post_progress('OL1M', 1)  # warm up the session and user lookups
+        for page in (10, 11, 100):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.post_progress('OL1M', page)
+            self.assertEqual(response.status_code, 200)
+            writes = [q['sql'] for q in queries if not q['sql'].startswith('SELECT')]
+            self.assertEqual(len(writes), 1, writes)
+            self.assertTrue(writes[0].startswith('UPDATE "library_userbooklist"'), writes[0])
+        book = UserBookList.objects.get(olid='OL1M')
+        self.assertEqual((book.current_page, book.status), (100, 'finished'))
+
+    def test_unknown_book_is_not_found(self):
+        self.assertEqual(self.post_progress('OL2M', 10).status_code, 404)
+
+
+class UpdateReturningTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        self.other = User.objects.create_user('other', 'other@example.com', 'password')
+        UserBookList.objects.create(user=self.user, olid='OL1M', title='Emma')
+        UserBookList.objects.create(user=self.other, olid='OL1M', title='Emma')
+
+    def test_toggle_favorite_is_one_statement(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(UserBookList.toggle_favorite(self.user.id, 'OL1M'))
+        self.assertFalse(UserBookList.toggle_favorite(self.user.id, 'OL1M'))
+        self.assertFalse(UserBookList.objects.get(user=self.other).is_favorite)
+
+    def test_missing_book_returns_none(self):
+        self.assertIsNone(UserBookList.toggle_favorite(self.user.id, 'OL2M'))
+        self.assertIsNone(UserBookList.replace_tags(self.user.id, 'OL2M', ['x']))
+
+    def test_fallback_without_returning(self):
+        with mock.patch.object(connection, 'vendor', 'mysql'):
+            self.assertTrue(UserBookList.toggle_favorite(self.user.id, 'OL1M'))
+            self.assertIsNone(UserBookList.toggle_favorite(self.user.id, 'OL2M'))
+        self.assertTrue(UserBookList.objects.get(user=self.user).is_favorite)
+
+    def test_replace_tags_updates_column_and_links(self):
+        self.assertEqual(UserBookList.replace_tags(self.user.id, 'OL1M', [' classics ', 'to-lend', 'classics', '']), ['classics', 'to-lend'])
+        book = UserBookList.objects.get(user=self.user)
+        self.assertEqual(book.tags, 'classics, to-lend')
+        self.assertEqual(sorted(book.tag_set.values_list('name', flat=True)), ['classics', 'to-lend'])
+        self.assertEqual(UserBookList.replace_tags(self.user.id, 'OL1M', []), [])
+        self.assertFalse(UserBookList.objects.get(user=self.user).tag_set.exists())
+
+
+class ParseRangeTests(TestCase):
+    def test_ranges(self):
+        self.assertEqual(parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range('bytes=900-', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=900-5000', 1000), (900, 999))  # end clamped
+        self.assertEqual(parse_range('bytes=-100', 1000), (900, 999))  # suffix
+        self.assertEqual(parse_range('bytes=-5000', 1000), (0, 999))
+        self.assertEqual(parse_range(' bytes=0-0 ', 1000), (0, 0))
+
+    def test_ignored_headers(self):
+        for header in (None, '', 'bytes=-', 'bytes=0-1,5-9', 'items=0-9', 'bytes=a-b'):
+            self.assertIsNone(parse_range(header, 1000), header)
+
+    def test_unsatisfiable(self):
+        self.assertIs(parse_range('bytes=1000-', 1000), False)
+        self.assertIs(parse_range('bytes=5-4', 1000), False)
+        self.assertIs(parse_range('bytes=-0', 1000), False)
+
+
+class BookFileViewTests(TestCase):
+    data = bytes(range(256)) * 4
+
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        storage = FileSystemStorage(location=location)
+        patcher = mock.patch('library.bookfiles.get_book_storage', return_value=storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        sha256 = hashlib.sha256(self.data).hexdigest()
+        name = storage.save(f"book/{sha256}.pdf", ContentFile(self.data))
+        self.book_file = BookFile.objects.create(key='book', name=name, size=len(self.data), sha256=sha256)
+        self.url = '/books/book/file/'
+        self.client.force_login(User.objects.create_user('reader', 'reader@example.com', 'password'))
+
+    def get(self, **headers):
+        return self.client.get(self.url, headers=headers)
+
+    def test_full_file(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+        self.assertEqual((response['Content-Length'], response['ETag']), (str(len(self.data)), self.book_file.etag))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_range(self):
+        response = self.get(Range='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.data[10:20])
+        self.assertEqual((response['Content-Range'], response['Content-Length']), (f'bytes 10-19/{len(self.data)}', '10'))
+
+    def test_if_range(self):
+        response = self.get(Range='bytes=10-19', If_Range=self.book_file.etag)
+        self.assertEqual(response.status_code, 206)
+        response = self.get(Range='bytes=10-19', If_Range='"another-version"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+
+    def test_unsatisfiable_range(self):
+        response = self.get(Range=f'bytes={len(self.data)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.data)}')
+
+    def test_not_modified(self):
+        response = self.get(If_None_Match=self.book_file.etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+    def test_versioned_url_is_immutable(self):
+        response = self.client.get(self.url, {'v': self.book_file.version})
+        self.assertIn('immutable', response['Cache-Control'])
+
+
+@override_settings(OPENLIBRARY_BREAKER_THRESHOLD=3, OPENLIBRARY_CONNECT_TIMEOUT=0.1)
+class OpenLibraryBreakerTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(requests.Session, 'get', side_effect=requests.ConnectionError('down'))
+        self.session_get = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_breaker_opens_and_fails_fast(self):
+        for _ in range(3):
+            self.assertIsNone(openlibrary.get_json('/search.json'))
+        self.assertTrue(openlibrary.circuit_open('search'))
+        self.assertFalse(openlibrary.circuit_open('records'))
+
+        self.session_get.reset_mock()
+        with self.assertRaises(openlibrary.CircuitOpenError):
+            openlibrary.get('/search.json')
+        self.session_get.assert_not_called()
+
+    def test_successful_probe_closes_breaker(self):
+        for _ in range(3):
+            openlibrary.get_json('/books/OL1M.json')
+        openlibrary.cache.delete('ol_circuit_open_records')  # cooldown over: half-open
+        self.session_get.side_effect = None
+        self.session_get.return_value = mock.Mock(status_code=200)
+        openlibrary.get('/books/OL1M.json')
+        self.assertFalse(openlibrary.circuit_open('records'))
+
+    def test_budgeted_call_retries_once(self):
+        with openlibrary.budget(5):
+            self.assertIsNone(openlibrary.get_json('/authors/OL1A.json'))
+        self.assertEqual(self.session_get.call_count, 2)
+
+    def test_spent_budget_makes_no_call(self):
+        with openlibrary.budget(0):
+            with self.assertRaises(openlibrary.BudgetExhaustedError):
+                openlibrary.get('/authors/OL1A.json')
+        self.session_get.assert_not_called()
+
+
+class SingleFlightTests(TestCase):
+    def test_follower_waits_no_longer_than_its_budget(self):
+        caching.cache.add('flight_lock_slow', 1)  # another worker is leading
+        func = mock.Mock(return_value='fetched')
+        started = time.monotonic()
+        with mock.patch.object(caching.cache, 'get_many', wraps=caching.cache.get_many) as get_many, openlibrary.budget(0.5):
+            self.assertEqual(caching.single_flight('slow', func), 'fetched')
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertLessEqual(get_many.call_count, 5)  # polls back off
+        func.assert_called_once_with()
+
+    def test_follower_gets_published_result(self):
+        caching.cache.add('flight_lock_fast', 1)
+        caching.cache.set('flight_result_fast', ('shared',))
+        func = mock.Mock()
+        self.assertEqual(caching.single_flight('fast', func), 'shared')
+        func.assert_not_called()
+
+
+class LibraryPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        self.client.force_login(self.user)
+        for i, (title, current_page) in enumerate([('Emma', 50), ('Emma', 10), ('Beloved', 0), ('Ulysses', 100), ('Dracula', 30)]):
+            UserBookList.objects.create(
+                user=self.user, olid=f'OL{i}M', title=title, pages=100, current_page=current_page, is_favorite=i % 2 == 0
+            )
+        UserBookList.objects.create(user=User.objects.create_user('other'), olid='OL9M', title='Persuasion')
+
+    def walk(self, **params):
+        olids, cursor = [], None
+        while True:
+            query = {**params, 'limit': 2, **({'cursor': cursor} if cursor else {})}
+            data = self.client.get('/api/library/', query).json()
+            olids += [book['olid'] for book in data['books']]
+            cursor = data['next_cursor']
+            if not cursor:
+                return olids
+
+    def test_pages_cover_the_library_once_in_order(self):
+        self.assertEqual(self.walk(sort='title'), ['OL2M', 'OL4M', 'OL0M', 'OL1M', 'OL3M'])
+        self.assertEqual(self.walk(sort='title', order='desc'), ['OL3M', 'OL1M', 'OL0M', 'OL4M', 'OL2M'])
+        self.assertEqual(self.walk(sort='progress'), ['OL2M', 'OL1M', 'OL4M', 'OL0M', 'OL3M'])
+
+    def test_filters(self):
+        self.assertEqual(self.walk(sort='title', favorite='true'), ['OL2M', 'OL4M', 'OL0M'])
+        self.assertEqual(self.walk(sort='title', status='finished,to_read'), ['OL2M', 'OL3M'])
+
+    def test_cursor_must_match_sort_and_order(self):
+        cursor = self.client.get('/api/library/', {'sort': 'title', 'limit': 2}).json()['next_cursor']
+        self.assertEqual(self.client.get('/api/library/', {'sort': 'progress', 'cursor': cursor}).status_code, 400)
+        self.assertEqual(self.client.get('/api/library/', {'sort': 'title', 'order': 'desc', 'cursor': cursor}).status_code, 400)
+        self.assertEqual(self.client.get('/api/library/', {'sort': 'title', 'cursor': cursor}).status_code, 200)
+
+    def test_malformed_cursors_are_rejected(self):
+        forged = base64.urlsafe_b64encode(json.dumps(['progress', 'asc', 'abc', 1]).encode()).decode()
+        for cursor in ('not-a-cursor', forged):
+            response = self.client.get('/api/library/', {'sort': 'progress', 'cursor': cursor})
+            self.assertEqual(response.status_code, 400, cursor)
+
+
+class ExportUserTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user('staff', is_staff=True)
+        self.reader = User.objects.create_user('reader')
+        UserBookList.objects.create(user=self.reader, olid='OL1M', title='Emma')
+
+    def test_staff_can_export_another_user(self):
+        self.client.force_login(self.staff)
+        response = self.client.get('/api/library/export/', {'user_id': self.reader.id, 'format': 'ndjson'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'OL1M', b''.join(response.streaming_content))
+
+    def test_non_numeric_user_id_is_a_bad_request(self):
+        self.client.force_login(self.staff)
+        for path in ('/api/library/export/', '/api/purchase_history/export/'):
+            self.assertEqual(self.client.get(path, {'user_id': 'abc'}).status_code, 400, path)
+
+
+class CoverCacheTests(TestCase):
+    def setUp(self):
+        self.cover_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cover_dir)
+        settings_patcher = override_settings(COVER_CACHE_DIR=self.cover_dir)
+        settings_patcher.enable()
+        self.addCleanup(settings_patcher.disable)
+
+    def get(self, key):
+        with mock.patch('library.covers.fetch_cover', return_value=f'image {key}'.encode()) as fetch_cover:
+            response = self.client.get(f'/covers/olid/{key}-M.jpg')
+        return response, fetch_cover
+
+    def test_anonymous_miss_is_sent_to_open_library(self):
+        response, fetch_cover = self.get('OL1M')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], 'https://covers.openlibrary.org/b/olid/OL1M-M.jpg')
+        fetch_cover.assert_not_called()
+        self.assertEqual(os.listdir(self.cover_dir), [])
+
+    def test_signed_in_miss_is_cached_and_then_served_to_anyone(self):
+        self.client.force_login(User.objects.create_user('reader'))
+        response, fetch_cover = self.get('OL1M')
+        self.assertEqual(response.status_code, 200)
+        fetch_cover.assert_called_once()
+        self.assertTrue(Job.objects.filter(kind='prune_covers', status='pending').exists())
+
+        self.client.logout()
+        response, fetch_cover = self.get('OL1M')
+        self.assertEqual((response.status_code, b''.join(response.streaming_content)), (200, b'image OL1M'))
+        fetch_cover.assert_not_called()
+
+    def test_prune_evicts_least_recently_used(self):
+        for age, key in enumerate(['OL3M', 'OL2M', 'OL1M']):
+            digest = covers.store_cover('olid', key, 'M', f'image {key}'.encode())
+            os.utime(covers.object_path(digest), (time.time() - age * 60,) * 2)
+
+        self.assertEqual(covers.prune_covers(max_bytes=len(b'image OL1M') * 2), 1)
+        self.assertIsNone(covers.read_stored_cover('olid', 'OL1M', 'M'))
+        self.assertFalse(os.path.exists(covers.ref_path('olid', 'OL1M', 'M')))
+        self.assertIsNotNone(covers.read_stored_cover('olid', 'OL3M', 'M'))
+
+
+class BookFileVersionTests(TestCase):
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        self.storage = FileSystemStorage(location=location)
+        patcher = mock.patch('library.bookfiles.get_book_storage', return_value=self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def upload(self, data):
+        with mock.patch('library.bookfiles.enqueue_book_split'):
+            book_file, old_name = save_book_file('book', ContentFile(data))
+        if old_name:
+            enqueue_file_deletion("books", old_name, delay=3600)
+        return book_file.name
+
+    def test_reuploaded_version_is_not_deleted(self):
+        name_a = self.upload(b'version A')
+        self.upload(b'version B')
+        self.assertEqual(self.upload(b'version A'), name_a)
+
+        # The deletion queued when A was replaced is dropped...
+        self.assertFalse(Job.objects.filter(dedupe_key=f"delete_books_{name_a}", status='pending').exists())
+        # ...and one already running skips a name that is in use again
+        with mock.patch('library.tasks.storages', {'books': self.storage}):
+            delete_stored_file("books", name_a)
+        self.assertTrue(self.storage.exists(name_a))
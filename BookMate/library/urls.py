@@ -10,9 +10,11 @@ urlpatterns = [
     path('dashboard/', views.dashboard_view, name='dashboard'),  
     path('book/<str:olid>/', views.book_preview, name='book_preview'),
     path('book/<str:olid>/buy/', views.buy_book_links, name='buy_book_links'),
+    path('covers/<str:kind>/<str:key>-<str:size>.jpg', views.cover_image, name='cover_image'),
     path('profile/', views.profile_view, name='profile'),
     path('edit_profile/', views.edit_profile_view, name='edit_profile'),
     path('api/upload_profile_picture/', views.upload_profile_picture, name='upload_profile_picture'),
+    path('media/avatars/<str:name>', views.avatar_file, name='avatar_file'),  # matches STORAGES['avatars'] base_url
 
     # --- API routes for Open Library ---
     path('api/search/', views.search_books, name='search_books'),
@@ -22,12 +24,21 @@ urlpatterns = [
     path('api/toggle_favorite/', views.toggle_favorite, name='toggle_favorite'),
     path('api/update_tags/', views.update_tags, name='update_tags'),
     path('api/get_user_tags/', views.get_user_tags, name='get_user_tags'),
+    path('api/library/', views.library_books, name='library_books'),
+    path('api/library/bulk/', views.bulk_update_library, name='bulk_update_library'),
+    path('api/library/import/', views.import_library, name='import_library'),
+    path('api/library/import/<int:import_id>/', views.import_status, name='import_status'),
+    path('api/library/export/', views.export_library, name='export_library'),
     
     # --- Purchase routes ---
     path('purchase/', views.purchase_book, name='purchase_book'),
     path('api/purchase_history/', views.get_purchase_history, name='get_purchase_history'),
+    path('api/purchase_history/export/', views.export_purchases, name='export_purchases'),
 
     # Read Book
     path("api/mock-book/", views.get_mock_book, name="mock-book"),
+    path("books/<slug:key>/file/", views.book_file, name="book_file"),
+    path("api/books/<slug:key>/pages/", views.book_pages, name="book_pages"),
+    path("books/<slug:key>/pages/<int:number>.jpg", views.book_page_image, name="book_page_image"),
     path("read/", views.reader_view, name="reader"),
 ]
\ No newline at end of file
@@ -3,21 +3,37 @@ from django.contrib.auth import login, logout
 from django.contrib import messages
 from .forms import RegisterForm, LoginForm
 from django.contrib.auth.models import User
-from .models import UserBookList, UserProfile, Purchase
+from .models import BookFile, BookPage, LibraryImport, UserBookList, UserProfile, Purchase, Tag
+from . import openlibrary
+from .bookfiles import iter_file_range, parse_range
+from .bookpages import get_page_window
+from .avatars import save_avatar
+from .caching import single_flight
+from .covers import get_cover, is_valid_cover, local_cover_url, read_stored_cover
+from .exports import EXPORT_FORMATS, LIBRARY_EXPORT_FIELDS, PURCHASE_EXPORT_FIELDS, stream_export
+from .metadata import get_book_metadata, get_page_counts, metadata_age
+from .recommendations import get_recommendations, invalidate_recommendations
+from .storage import get_book_storage, storage_name_from_url
+from .tasks import enqueue_book_enrichment, enqueue_books_enrichment, enqueue_file_deletion, enqueue_library_import
 from django.shortcuts import render, get_object_or_404
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import storages
 from django.core.cache import cache
-from django.http import HttpResponseRedirect, JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.urls import reverse
-from django.db import IntegrityError
-from django.db.models import F
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, Case, Count, F, FloatField, IntegerField, Q, Value, When, Window
+from django.db.models.functions import Cast, Coalesce, Least, RowNumber
 from django.conf import settings
-from supabase import create_client, Client
 from decimal import Decimal
-import requests
+from requests import RequestException
+import base64
+import hashlib
 import uuid
 import os
 import json
 import secrets
+import time
 
 #register function
 def register_view(request):
@@ -110,6 +126,7 @@ def genre_setup_view(request):
             # Save selected genres as comma-separated string
             profile.favorite_genres = ", ".join(selected_genres)
             profile.save()
+            invalidate_recommendations(request.user.id)
             messages.success(request, f"Favorite genres saved! ({len(selected_genres)} genres selected)")
         return redirect('dashboard')
     return render(request, 'genre_setup.html')
@@ -118,18 +135,14 @@ def dashboard_view(request):
     if not request.user.is_authenticated:
         return redirect('login')
 
-    # Fetch this user's saved books
-    user_books = UserBookList.objects.filter(user=request.user).order_by('title')
+    # Only the first page of books is rendered; dashboard.js streams the rest from /api/library/
+    user_books = UserBookList.objects.filter(user=request.user).order_by('title', 'id')[:LIBRARY_PAGE_SIZE + 1]
     
     # Initialize variables
-    recommended_books = []
     user_favorite_genres = []
-    user_tags = set()
     
-    # Collect all unique tags from user's books
-    for book in user_books:
-        if book.tags:
-            user_tags.update(book.get_tags_list())
+    # All distinct tags in one indexed query
+    user_tags = Tag.names_for_user(request.user)
     
     # Get user's profile with favorite genres
     profile = None
@@ -140,102 +153,111 @@ def dashboard_view(request):
     except UserProfile.DoesNotExist:
         pass
     
-    # Build search terms from genres and tags
-    search_terms = []
-    if user_favorite_genres:
-        search_terms.extend(user_favorite_genres[:3])
-    if user_tags:
-        search_terms.extend(list(user_tags)[:2])
-    
-    # Fetch recommendations if we have search terms
-    if search_terms:
-        try:
-            query = "+".join(search_terms)  # Use + for better search
-            url = f"https://openlibrary.org/search.json?q={query}&limit=20"
-            
-            response = requests.get(url, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                user_olids = set(user_books.values_list('olid', flat=True))
-                
-                for book in data.get("docs", []):
-                    if len(recommended_books) >= 12:
-                        break
-                    
-                    # Get OLID
-                    olid = book.get("cover_edition_key")
-                    if not olid and book.get("edition_key"):
-                        olid = book.get("edition_key")[0]
-                    
-                    # Skip if no OLID or user already has it
-                    if not olid or olid in user_olids:
-                        continue
-                    
-                    # Add to recommendations
-                    recommended_books.append({
-                        "title": book.get("title", "Unknown Title"),
-                        "author": ", ".join(book.get("author_name", [])) if book.get("author_name") else "Unknown",
-                        "cover_url": f"https://covers.openlibrary.org/b/olid/{olid}-M.jpg",
-                        "olid": olid,
-                        "year": book.get("first_publish_year", "Unknown"),
-                    })
-        except Exception as e:
-            print(f"Error fetching recommendations: {e}")
+    user_books = list(user_books)
+    library_next_cursor = None
+    if len(user_books) > LIBRARY_PAGE_SIZE:
+        user_books = user_books[:LIBRARY_PAGE_SIZE]
+        library_next_cursor = encode_cursor('title', False, user_books[-1].title, user_books[-1].id)
+
+    # Recommendations are precomputed off the request path; never block on the network here
+    # (books added since are filtered out; only the olids are needed, not the rows)
+    user_olids = set(UserBookList.objects.filter(user=request.user).values_list('olid', flat=True))
+    recommended_books = get_recommendations(request.user.id, profile, user_olids)
     
     return render(request, "dashboard.html", {
         "user_books": user_books,
+        "library_next_cursor": library_next_cursor,
         "recommended_books": recommended_books,
         "user_favorite_genres": user_favorite_genres,
-        "user_tags": sorted(list(user_tags)),
+        "user_tags": user_tags,
     })
 
 
 
+PROFILE_LIST_LIMIT = 100  # books shown per profile section
+
+# Stored reading status, backed by the (user, status) index
+FINISHED = Q(status='finished')
+
+
+def get_profile_sections(user, limit=PROFILE_LIST_LIMIT):
+    """
+    Returns (reading, completed, favorites) for the profile page, each
+    capped at `limit` books, from a single query.
+
+    Rows are ranked by title within their reading state and within
+    favourites using window functions, and only rows that make it into at
+    least one section are fetched.
+    """
+    books = (
+        UserBookList.objects.filter(user=user)
+        .only('title', 'author', 'cover_url', 'pages', 'current_page', 'is_favorite', 'status')
+        .annotate(is_finished=Case(When(FINISHED, then=Value(True)), default=Value(False), output_field=BooleanField()))
+        .annotate(
+            state_rank=Window(RowNumber(), partition_by=[F('is_finished')], order_by=F('title').asc()),
+            favorite_rank=Window(RowNumber(), partition_by=[F('is_favorite')], order_by=F('title').asc()),
+        )
+        .annotate(list_rank=Case(
+            When(is_favorite=True, then=Least('state_rank', 'favorite_rank')),
+            default=F('state_rank'),
+            output_field=IntegerField(),
+        ))
+        .filter(list_rank__lte=limit)
+    )
+
+    reading, completed, favorites = [], [], []
+    for book in books:
+        if book.state_rank <= limit:
+            (completed if book.is_finished else reading).append(book)
+        if book.is_favorite and book.favorite_rank <= limit:
+            favorites.append(book)
+    return reading, completed, favorites
+
+
 def profile_view(request):
     if not request.user.is_authenticated:
         return redirect('login')
     
-    # Refresh user data from database
-    user = User.objects.get(pk=request.user.pk)
+    # request.user is already loaded fresh from the database for each request
+    user = request.user
     
-    # Get user's books
-    user_books = UserBookList.objects.filter(user=user)
+    # All stats in one conditional-aggregation query
+    stats = UserBookList.objects.filter(user=user).aggregate(
+        total_books=Count('id'),
+        currently_reading=Count('id', filter=~FINISHED),  # All books except finished ones
+        finished_books=Count('id', filter=FINISHED),
+        favorite_books_count=Count('id', filter=Q(is_favorite=True)),
+    )
     
-    # Calculate stats
-    total_books = user_books.count()
-    books_with_progress = user_books.exclude(current_page__gte=F('pages'), pages__gt=0)  # Show all books except finished ones
-    finished_books = user_books.filter(current_page__gte=F('pages'), pages__gt=0)
-    favorite_books = user_books.filter(is_favorite=True)
+    # All three book lists in one query
+    reading_books, completed_books, favorite_books = get_profile_sections(user)
     
     # Get user's favorite genres and profile picture from profile
-    user_favorite_genres = []
-    profile_picture_url = None
-    try:
-        profile = UserProfile.objects.get(user=user)
-        user_favorite_genres = profile.get_favorite_genres_list()
-        profile_picture_url = profile.profile_picture_url
-    except UserProfile.DoesNotExist:
-        user_favorite_genres = []
-        profile_picture_url = None
+    profile = (
+        UserProfile.objects.filter(user=user)
+        .only('favorite_genres', 'profile_picture_url', 'profile_picture_variants')
+        .first()
+    )
+    user_favorite_genres = profile.get_favorite_genres_list() if profile else []
+    profile_picture_url = profile.get_profile_picture_url() if profile else None
+    profile_picture_srcset = profile.get_profile_picture_srcset() if profile else ""
     
     context = {
         'user': user,
-        'total_books': total_books,
-        'currently_reading': books_with_progress.count(),
-        'finished_books': finished_books.count(),
-        'favorite_books_count': favorite_books.count(),
+        **stats,
         'user_favorite_genres': user_favorite_genres,
         'profile_picture_url': profile_picture_url,
-        'reading_books': books_with_progress[:100],  # Show 100 currently reading
-        'completed_books': finished_books[:100],  # Show 100 finished
-        'favorite_books': favorite_books[:100],  # Show 100 favorite books
+        'profile_picture_srcset': profile_picture_srcset,
+        'reading_books': reading_books,  # Show 100 currently reading
+        'completed_books': completed_books,  # Show 100 finished
+        'favorite_books': favorite_books,  # Show 100 favorite books
     }
     
     return render(request, 'profile.html', context)
 
 
 def upload_profile_picture(request):
-    """Handle profile picture upload to Supabase storage bucket"""
+    """Handle profile picture upload to the avatars storage (Supabase bucket or local files)"""
     if not request.user.is_authenticated:
         return JsonResponse({"success": False, "message": "Not authenticated"}, status=403)
     
@@ -264,44 +286,31 @@ def upload_profile_picture(request):
         }, status=400)
     
     try:
-        # Initialize Supabase client
-        supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
-        
-        # Generate unique filename
-        unique_filename = f"{request.user.id}_{uuid.uuid4()}{file_ext}"
-        
-        # Read file content
-        file_content = file.read()
-        
-        # Upload to Supabase storage bucket
-        response = supabase.storage.from_(settings.SUPABASE_BUCKET).upload(
-            path=unique_filename,
-            file=file_content,
-            file_options={"content-type": file.content_type}
-        )
-        
-        # Get public URL
-        public_url = supabase.storage.from_(settings.SUPABASE_BUCKET).get_public_url(unique_filename)
-        
-        # Update or create user profile with the new profile picture URL
+        # Re-encoded to fixed sizes (EXIF stripped); the original bytes are never stored
+        try:
+            variants = save_avatar(request.user.id, file)
+        except ValueError:
+            return JsonResponse({"success": False, "message": "That file isn't a readable image"}, status=400)
+        public_url = variants['large'][1]
+
+        # Update or create user profile with the new profile picture URLs
         profile, created = UserProfile.objects.get_or_create(user=request.user)
-        
-        # Delete old profile picture from Supabase if exists
-        if profile.profile_picture_url:
-            try:
-                # Extract filename from old URL
-                old_filename = profile.profile_picture_url.split('/')[-1]
-                supabase.storage.from_(settings.SUPABASE_BUCKET).remove([old_filename])
-            except Exception as e:
-                print(f"Error deleting old profile picture: {e}")
-        
+
+        # Old pictures are deleted by the job worker, off the request path
+        storage = storages["avatars"]
+        old_urls = {profile.profile_picture_url, *profile.profile_picture_variants.values()}
+        for old_name in filter(None, (storage_name_from_url(storage, url) for url in old_urls)):
+            enqueue_file_deletion("avatars", old_name)
+
         profile.profile_picture_url = public_url
-        profile.save()
+        profile.profile_picture_variants = {size: url for size, (name, url) in variants.items()}
+        profile.save(update_fields=["profile_picture_url", "profile_picture_variants"])
         
         return JsonResponse({
             "success": True,
             "message": "Profile picture uploaded successfully!",
-            "url": public_url
+            "url": profile.get_profile_picture_url(),
+            "variants": profile.profile_picture_variants,
         })
         
     except Exception as e:
@@ -311,6 +320,21 @@ def upload_profile_picture(request):
         }, status=500)
 
 
+def avatar_file(request, name):
+    """
+    Serves a profile picture from local avatar storage (used when Supabase
+    isn't configured). Every upload gets new names, so responses can be
+    cached for good.
+    """
+    try:
+        avatar = storages["avatars"].open(name, 'rb')
+    except (OSError, SuspiciousFileOperation):
+        raise Http404("Avatar not found")
+    response = FileResponse(avatar)
+    response['Cache-Control'] = "public, max-age=31536000, immutable"
+    return response
+
+
 def buy_book_links(request, olid):
     """Display buy links for a book - Philippine stores first, then international"""
     if not request.user.is_authenticated:
@@ -400,7 +424,7 @@ def edit_profile_view(request):
     profile_picture_url = None
     try:
         profile = UserProfile.objects.get(user=user)
-        profile_picture_url = profile.profile_picture_url
+        profile_picture_url = profile.get_profile_picture_url()
     except UserProfile.DoesNotExist:
         profile_picture_url = None
 
@@ -427,7 +451,7 @@ def edit_profile_view(request):
             # Refresh profile picture URL before re-rendering
             try:
                 profile = UserProfile.objects.get(user=user)
-                profile_picture_url = profile.profile_picture_url
+                profile_picture_url = profile.get_profile_picture_url()
             except UserProfile.DoesNotExist:
                 profile_picture_url = None
             return render(request, 'edit_profile.html', {
@@ -452,61 +476,65 @@ from django.views.decorators.csrf import csrf_exempt
 import json
 
 # --- SEARCH BOOKS via Open Library API ---
-def search_books(request):
-    query = request.GET.get("q", "")
-    if not query:
-        return JsonResponse({"results": []})
+def fetch_search_results(query):
+    """Searches Open Library and returns up to 10 results with page counts, or None if it can't answer"""
+    data = openlibrary.get_json("/search.json", params={"q": query})
+    if data is None:
+        return None
+
+    docs = data.get("docs", [])[:10]
+    olids = [
+        book.get("cover_edition_key") or (book.get("edition_key")[0] if book.get("edition_key") else None)
+        for book in docs
+    ]
 
-    url = f"https://openlibrary.org/search.json?q={query}"
-    response = requests.get(url)
-    data = response.json()
+    # ✅ Look up page counts concurrently; late lookups come back as 0
+    page_counts = get_page_counts(olids)
 
     results = []
-    for book in data.get("docs", [])[:10]:
-        olid = book.get("cover_edition_key") or (
-            book.get("edition_key")[0] if book.get("edition_key") else None
-        )
+    for book, olid in zip(docs, olids):
         cover_url = f"https://covers.openlibrary.org/b/olid/{olid}-M.jpg" if olid else None
 
-        number_of_pages = None
-
-        if olid:
-            # ✅ 1) Try Books API jscmd=data (best source)
-            try:
-                api_url = f"https://openlibrary.org/api/books?bibkeys=OLID:{olid}&jscmd=data&format=json"
-                api_resp = requests.get(api_url)
-                api_data = api_resp.json().get(f"OLID:{olid}", {})
-
-                number_of_pages = api_data.get("number_of_pages")
-            except Exception:
-                pass
-
-            # ✅ 2) Edition fallback if still none
-            if not number_of_pages:
-                try:
-                    edition_url = f"https://openlibrary.org/books/{olid}.json"
-                    edition_resp = requests.get(edition_url)
-                    edition_data = edition_resp.json()
-
-                    number_of_pages = edition_data.get("number_of_pages")
-
-                    # Fallback: parse from pagination text
-                    if not number_of_pages and edition_data.get("pagination"):
-                        import re
-                        digits = re.findall(r"\d+", edition_data["pagination"])
-                        if digits:
-                            number_of_pages = int(digits[-1])
-                except Exception:
-                    number_of_pages = None
-
         results.append({
             "title": book.get("title"),
             "author": ", ".join(book.get("author_name", [])) if book.get("author_name") else "Unknown",
             "cover_url": cover_url,
+            "thumb_url": local_cover_url(cover_url, "grid"),
             "olid": olid,
-            "pages": number_of_pages or 0,  # ✅ always return a number
+            "pages": page_counts.get(olid, 0),  # ✅ always return a number
         })
 
+    return results
+
+
+def search_books(request):
+    query = request.GET.get("q", "")
+    if not query:
+        return JsonResponse({"results": []})
+
+    # Fresh results are served from the cache; older ones are kept as a fallback
+    query_hash = hashlib.md5(query.strip().lower().encode()).hexdigest()
+    cached = cache.get(f"search_results_{query_hash}")
+    if cached and time.time() - cached["fetched_at"] < settings.SEARCH_CACHE_TIMEOUT:
+        return JsonResponse({"results": cached["results"]})
+
+    # Identical concurrent searches share one Open Library round trip
+    results = single_flight(f"search_{query_hash}", fetch_search_results, query)
+    if results is None:
+        # ✅ Open Library is down (or its circuit is open): fall back to an older copy
+        if cached:
+            return JsonResponse({"results": cached["results"]})
+        return JsonResponse({
+            "results": [],
+            "unavailable": True,
+            "message": "Search is temporarily unavailable. Please try again in a moment.",
+        }, status=503)
+
+    cache.set(
+        f"search_results_{query_hash}",
+        {"results": results, "fetched_at": time.time()},
+        timeout=settings.SEARCH_CACHE_MAX_STALE,
+    )
     return JsonResponse({"results": results})
 
 
@@ -528,53 +556,23 @@ def add_book(request):
 
         pages = data.get("pages")  # may be None from frontend
 
-        # ✅ If pages not provided by search API, fetch from Open Library
-        if not pages:
-            pages = None
-
-            # 1) Try jscmd=data API
-            try:
-                api_url = f"https://openlibrary.org/api/books?bibkeys=OLID:{olid}&jscmd=data&format=json"
-                api_resp = requests.get(api_url)
-                api_data = api_resp.json().get(f"OLID:{olid}", {})
-
-                pages = api_data.get("number_of_pages")
-            except Exception:
-                pass
-
-            # 2) Try edition JSON fallback
-            if not pages:
-                try:
-                    edition_url = f"https://openlibrary.org/books/{olid}.json"
-                    edition_resp = requests.get(edition_url)
-                    edition_data = edition_resp.json()
-
-                    pages = edition_data.get("number_of_pages")
-
-                    # parse pagination if needed
-                    if not pages and edition_data.get("pagination"):
-                        import re
-                        digits = re.findall(r"\d+", edition_data["pagination"])
-                        if digits:
-                            pages = int(digits[-1])
-                except Exception:
-                    pages = None
-
-        # ✅ Create or get book
-        book, created = UserBookList.objects.get_or_create(
-            user=request.user,
-            olid=olid,
-            defaults={
-                "title": title,
-                "author": author,
-                "cover_url": cover_url,
-                "pages": pages or 0,  # always store something
-            },
-        )
-
-        if not created:
+        # ✅ Insert right away; unknown pages (0), description and cover are
+        # filled in by the enrich_book job (python manage.py run_worker)
+        try:
+            with transaction.atomic():
+                UserBookList.objects.create(
+                    user=request.user,
+                    olid=olid,
+                    title=title,
+                    author=author,
+                    cover_url=cover_url,
+                    pages=pages or 0,  # always store something
+                )
+        except IntegrityError:
             return JsonResponse({"message": "Book already in your list!"})
 
+        enqueue_book_enrichment(olid)
+        invalidate_recommendations(request.user.id)
         return JsonResponse({"message": "Book added successfully!"})
 
 # --- REMOVE BOOK FROM USER LIST ---
@@ -591,6 +589,7 @@ def remove_book(request):
         deleted_count, _ = UserBookList.objects.filter(user=request.user, olid=olid).delete()
 
         if deleted_count > 0:
+            invalidate_recommendations(request.user.id)
             return JsonResponse({"message": "Book removed successfully!"})
         else:
             return JsonResponse({"message": "Book not found or already removed."}, status=404)
@@ -610,12 +609,14 @@ def update_progress(request):
             return JsonResponse({"success": False, "message": "Not logged in"}, status=403)
 
         try:
-            book = UserBookList.objects.get(user=request.user, olid=olid)
-            book.current_page = int(progress)
-            book.save()
-            return JsonResponse({"success": True, "progress": book.current_page})
-        except UserBookList.DoesNotExist:
+            progress = max(int(progress), 0)
+        except (TypeError, ValueError):
+            return JsonResponse({"success": False, "message": "Invalid progress"}, status=400)
+
+        # One targeted UPDATE of current_page and status; no row load and re-save
+        if not UserBookList.set_progress(request.user.id, olid, progress):
             return JsonResponse({"success": False, "message": "Book not found"}, status=404)
+        return JsonResponse({"success": True, "progress": progress})
 
     return JsonResponse({"success": False, "message": "Invalid request"}, status=400)
 
@@ -623,6 +624,9 @@ def update_progress(request):
 @csrf_exempt
 def toggle_favorite(request):
     if request.method == "POST":
+        if not request.user.is_authenticated:
+            return JsonResponse({"success": False, "message": "Not logged in"}, status=403)
+
         data = json.loads(request.body)
         olid = data.get("olid")
 
@@ -630,18 +634,16 @@ def toggle_favorite(request):
             return JsonResponse({"success": False, "message": "No OLID provided"}, status=400)
 
         try:
-            # Toggle favorite status for the book belonging to this user
-            book = UserBookList.objects.get(user=request.user, olid=olid)
-            book.is_favorite = not book.is_favorite
-            book.save()
+            # Flip and read back in one UPDATE ... RETURNING, so racing tabs can't lose a toggle
+            is_favorite = UserBookList.toggle_favorite(request.user.id, olid)
+            if is_favorite is None:
+                return JsonResponse({"success": False, "message": "Book not found"}, status=404)
 
             return JsonResponse({
                 "success": True,
-                "message": f"Book {'marked' if book.is_favorite else 'unmarked'} as favorite!",
-                "is_favorite": book.is_favorite
+                "message": f"Book {'marked' if is_favorite else 'unmarked'} as favorite!",
+                "is_favorite": is_favorite
             })
-        except UserBookList.DoesNotExist:
-            return JsonResponse({"success": False, "message": "Book not found"}, status=404)
         except Exception as e:
             return JsonResponse({"success": False, "message": str(e)}, status=500)
 
@@ -654,147 +656,143 @@ def dashboard(request):
     return render(request, 'dashboard.html', {'user_books': user_books})
 
 
-# --- UPDATE BOOK DETAILS (genres, tags, links) ---
-@csrf_exempt
-# def book_preview(request, olid):
-#     book = get_object_or_404(UserBookList, olid=olid, user=request.user)
-#     return render(request, 'book_preview.html', {'book': book})
+# --- COVER IMAGES (local cache in front of covers.openlibrary.org)
+def cover_image(request, kind, key, size):
+    """
+    Serves a cover from the on-disk cover cache, fetching it once on a miss.
 
+    `size` is one of Open Library's S/M/L or a thumbnail variant (thumb,
+    grid). Responses carry the image's content hash as a strong ETag and a
+    long Cache-Control, so browsers revalidate with a 304 at most. Only
+    signed-in users can add covers to the cache; anyone else is sent to
+    Open Library for covers it doesn't hold yet.
+    """
+    if not is_valid_cover(kind, key, size):
+        raise Http404("Unknown cover")
+    # Thumbnail variants are ours; Open Library only has its own sizes
+    hotlink_url = f"https://covers.openlibrary.org/b/{kind}/{key}-{size if size in ('S', 'M', 'L') else 'M'}.jpg"
 
-#BOOK PREVIEW API FETCH
-def book_preview(request, olid):
-    # --- Check cache first ---
+    if not request.user.is_authenticated:
+        cover = read_stored_cover(kind, key, size)
+        if cover is None:
+            return HttpResponseRedirect(hotlink_url)
+    else:
+        try:
+            cover = get_cover(kind, key, size)
+        except (RequestException, OSError) as e:
+            print(f"Error caching cover {kind}/{key}-{size}: {e}")
+            # Fall back to hot-linking rather than showing a broken image
+            return HttpResponseRedirect(hotlink_url)
+
+    if cover is None:
+        raise Http404("No cover")
+
+    path, digest = cover
+    etag = f'"{digest}"'
+    cache_control = f"public, max-age={settings.COVER_CACHE_MAX_AGE}"
+    if etag in request.headers.get("If-None-Match", ""):
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(open(path, 'rb'), content_type='image/jpeg')
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
+
+
+# --- SHARED BOOK PREVIEW DATA ---
+def get_shared_book_data(olid):
+    """
+    Returns the user-independent part of a book preview, cached per OLID.
+
+    Only Open Library metadata goes in this entry so it can be shared by
+    every user with a long TTL; anything per-user is overlaid by the view.
+    Entries never outlive the metadata's freshness, so once a book goes
+    stale the metadata store serves it while refreshing in the background.
+    """
     cache_key = f"book_data_{olid}"
     cached_data = cache.get(cache_key)
 
     if cached_data:
         print(f"📘 Cache hit for {olid}")
-        return render(request, "book_preview.html", cached_data)
+        return cached_data
 
     print(f"🌐 Cache miss for {olid}, fetching from API...")
 
-    # --- Fetch from Open Library Works ---
-    work_url = f"https://openlibrary.org/works/{olid}.json"
-    work_response = requests.get(work_url)
-
-    if work_response.status_code != 200:
-        edition_url = f"https://openlibrary.org/books/{olid}.json"
-        edition_response = requests.get(edition_url)
-        if edition_response.status_code == 200:
-            data = edition_response.json()
-        else:
-            user_book = UserBookList.objects.filter(user=request.user, olid=olid).first()
-            data = {
-                "title": user_book.title if user_book else "Book not found",
-                "authors": [user_book.author] if user_book else [],
-                "description": "No data available.",
-                "cover_url": user_book.cover_url if user_book else None,
-                "olid": olid,
-                "pages": user_book.pages if user_book else 0,
-            }
-            cache.set(cache_key, data, timeout=3600)
-            return render(request, "book_preview.html", data)
-    else:
-        data = work_response.json()
-
-    # --- Extract fields ---
-    title = data.get("title", "Unknown Title")
-
-    # ✅ Description
-    if "description" in data:
-        description = data["description"]["value"] if isinstance(data["description"], dict) else data["description"]
-    elif "excerpts" in data and data["excerpts"]:
-        description = data["excerpts"][0].get("excerpt", "")
-    elif "first_sentence" in data:
-        description = data["first_sentence"].get("value", "") if isinstance(data["first_sentence"], dict) else data["first_sentence"]
-    elif "notes" in data:
-        description = data["notes"]
-    else:
-        description = "No description available."
-
-    # ✅ Authors
-    authors = []
-    if "authors" in data:
-        for author_obj in data["authors"]:
-            key = author_obj.get("author", {}).get("key") or author_obj.get("key")
-            if key:
-                author_url = f"https://openlibrary.org{key}.json"
-                author_res = requests.get(author_url)
-                if author_res.status_code == 200:
-                    author_data = author_res.json()
-                    authors.append(author_data.get("name"))
-    elif "by_statement" in data:
-        authors.append(data["by_statement"])
-    elif "author_name" in data:
-        authors.append(", ".join(data["author_name"]))
-
-    if not authors:
-        user_book = UserBookList.objects.filter(user=request.user, olid=olid).first()
-        authors = [user_book.author] if user_book and user_book.author else ["Unknown Author"]
-
-    # ✅ Cover
-    cover_id = data.get("covers", [None])[0]
-    cover_url = f"https://covers.openlibrary.org/b/id/{cover_id}-L.jpg" if cover_id else None
-
-    if not cover_url:
-        user_book = UserBookList.objects.filter(user=request.user, olid=olid).first()
-        if user_book and user_book.cover_url:
-            cover_url = user_book.cover_url
-
-    # ✅ ✅ ✅ PAGES FETCHING
-
-    pages = None
-
-    # 1) Try Books API jscmd=data (most reliable)
-    try:
-        api_url = f"https://openlibrary.org/api/books?bibkeys=OLID:{olid}&jscmd=data&format=json"
-        api_resp = requests.get(api_url)
-        if api_resp.status_code == 200:
-            api_data = api_resp.json().get(f"OLID:{olid}", {})
-            pages = api_data.get("number_of_pages")
-    except:
-        pass
-
-    # 2) Try edition JSON (fallback)
-    if not pages:
-        try:
-            edition_url = f"https://openlibrary.org/books/{olid}.json"
-            edition_resp = requests.get(edition_url)
-            if edition_resp.status_code == 200:
-                edition_data = edition_resp.json()
-                pages = edition_data.get("number_of_pages")
-
-                # Fallback from pagination (e.g. "350 pages")
-                if not pages and edition_data.get("pagination"):
-                    import re
-                    digits = re.findall(r"\d+", edition_data["pagination"])
-                    if digits:
-                        pages = int(digits[-1])
-        except:
-            pass
-
-    # 3) DB fallback
-    if not pages:
-        user_book = UserBookList.objects.filter(user=request.user, olid=olid).first()
-        pages = user_book.pages if user_book else 0
-
-    # Get user's book tags if they have this book
-    user_book = UserBookList.objects.filter(user=request.user, olid=olid).first()
-    book_tags = user_book.get_tags_list() if user_book else []
-
-    # ✅ Prepare context
-    context = {
-        "title": title,
-        "authors": authors,
-        "description": description,
-        "cover_url": cover_url,
+    # --- Read through the shared metadata store ---
+    metadata = get_book_metadata(olid)
+
+    if metadata is None:
+        data = {"found": False, "olid": olid}
+        # Remember misses briefly so unknown OLIDs don't hammer Open Library,
+        # but not while its circuit is open: the OLID may well exist
+        if not openlibrary.circuit_open("records"):
+            cache.set(cache_key, data, timeout=settings.BOOK_PREVIEW_MISS_CACHE_TIMEOUT)
+        return data
+
+    data = {
+        "found": True,
+        "title": metadata.title,
+        "authors": metadata.authors,
+        "description": metadata.description,
+        "cover_url": metadata.cover_url,
         "olid": olid,
-        "pages": pages or 0,
-        "book_tags": book_tags,
-        "has_book": user_book is not None,
+        "pages": metadata.page_count or 0,
     }
+    fresh_for = settings.BOOK_METADATA_TTL - metadata_age(metadata)
+    if fresh_for > 0:
+        timeout = min(settings.BOOK_PREVIEW_CACHE_TIMEOUT, int(fresh_for))
+    else:
+        # Stale row being refreshed in the background; pick up the new one soon
+        timeout = settings.BOOK_PREVIEW_STALE_CACHE_TIMEOUT
+    cache.set(cache_key, data, timeout=max(timeout, 1))
+    return data
+
+
+# --- UPDATE BOOK DETAILS (genres, tags, links) ---
+@csrf_exempt
+# def book_preview(request, olid):
+#     book = get_object_or_404(UserBookList, olid=olid, user=request.user)
+#     return render(request, 'book_preview.html', {'book': book})
 
-    cache.set(cache_key, context, timeout=3600)
+
+#BOOK PREVIEW API FETCH
+def book_preview(request, olid):
+    book_data = get_shared_book_data(olid)
+
+    # --- Per-user overlay: one indexed (user, olid) lookup ---
+    user_book = None
+    if request.user.is_authenticated:
+        user_book = (
+            UserBookList.objects.filter(user=request.user, olid=olid)
+            .only("title", "author", "cover_url", "pages", "current_page", "tags")
+            .first()
+        )
+
+    if not book_data["found"]:
+        context = {
+            "title": user_book.title if user_book else "Book not found",
+            "authors": [user_book.author] if user_book else [],
+            "description": "No data available.",
+            "cover_url": user_book.cover_url if user_book else None,
+            "olid": olid,
+            "pages": user_book.pages if user_book else 0,
+        }
+    else:
+        context = dict(book_data)
+
+        # ✅ Authors, cover and pages fall back to the user's own copy
+        if not context["authors"]:
+            context["authors"] = [user_book.author] if user_book and user_book.author else ["Unknown Author"]
+        if not context["cover_url"] and user_book and user_book.cover_url:
+            context["cover_url"] = user_book.cover_url
+        if not context["pages"]:
+            context["pages"] = user_book.pages if user_book else 0
+
+    context.update({
+        "book_tags": user_book.get_tags_list() if user_book else [],
+        "has_book": user_book is not None,
+        "current_page": user_book.current_page if user_book else 0,
+    })
     return render(request, "book_preview.html", context)
 
 
@@ -813,17 +811,18 @@ def update_tags(request):
             return JsonResponse({"success": False, "message": "No OLID provided"}, status=400)
         
         try:
-            book = UserBookList.objects.get(user=request.user, olid=olid)
-            book.set_tags_list(tags)
-            book.save()
+            # Only the tags column and the Tag links are written; no read of the row first
+            with transaction.atomic():
+                tags = UserBookList.replace_tags(request.user.id, olid, tags)
+            if tags is None:
+                return JsonResponse({"success": False, "message": "Book not found"}, status=404)
+            invalidate_recommendations(request.user.id)
             
             return JsonResponse({
                 "success": True,
                 "message": "Tags updated successfully!",
-                "tags": book.get_tags_list()
+                "tags": tags
             })
-        except UserBookList.DoesNotExist:
-            return JsonResponse({"success": False, "message": "Book not found"}, status=404)
         except Exception as e:
             return JsonResponse({"success": False, "message": str(e)}, status=500)
     
@@ -835,15 +834,431 @@ def get_user_tags(request):
     if not request.user.is_authenticated:
         return JsonResponse({"tags": []})
     
-    # Get all unique tags from user's books
-    user_books = UserBookList.objects.filter(user=request.user)
-    all_tags = set()
+    # Distinct tags with their book counts, in one query
+    tag_counts = (
+        Tag.objects.filter(user=request.user, books__isnull=False)
+        .annotate(book_count=Count('books'))
+        .values_list('name', 'book_count')
+    )
+    counts = dict(tag_counts)
     
-    for book in user_books:
-        if book.tags:
-            all_tags.update(book.get_tags_list())
-    
-    return JsonResponse({"tags": sorted(all_tags)})
+    return JsonResponse({"tags": sorted(counts), "counts": counts})
+
+
+# --- BULK LIBRARY CHANGES
+BULK_MAX_OPERATIONS = 500
+BULK_OPERATIONS = ('add', 'remove', 'progress', 'favorite', 'tags')
+BULK_MAX_INT = 2147483647  # upper bound of the IntegerField columns
+
+
+def bulk_field_limit(field):
+    """Returns the max_length of a UserBookList field"""
+    return UserBookList._meta.get_field(field).max_length
+
+
+def clean_bulk_int(value):
+    """Coerces a pages/progress value to an int within the column's range, or raises ValueError"""
+    value = max(int(value), 0)
+    if value > BULK_MAX_INT:
+        raise ValueError(value)
+    return value
+
+
+def clean_bulk_operation(operation):
+    """
+    Validates one bulk operation and normalizes its values in place
+    (pages and progress to non-negative ints, tags to a list of strings).
+    Lengths and ranges are checked against the UserBookList columns.
+    Returns an error message, or None if the operation is valid.
+    """
+    if not isinstance(operation, dict) or operation.get("op") not in BULK_OPERATIONS:
+        return "Unknown operation"
+    if not operation.get("olid") or not isinstance(operation["olid"], str):
+        return "No OLID provided"
+    if len(operation["olid"]) > bulk_field_limit("olid"):
+        return "OLID is too long"
+
+    op = operation["op"]
+    if op == "add":
+        for field in ("title", "author", "cover_url"):
+            value = operation.get(field) or ""
+            if not isinstance(value, str):
+                return "title, author and cover_url must be strings"
+            if len(value) > bulk_field_limit(field):
+                return f"{field} is too long"
+        try:
+            operation["pages"] = clean_bulk_int(operation.get("pages") or 0)
+        except (TypeError, ValueError, OverflowError):
+            return "Invalid pages"
+    elif op == "progress":
+        try:
+            operation["progress"] = clean_bulk_int(operation.get("progress"))
+        except (TypeError, ValueError, OverflowError):
+            return "Invalid progress"
+    elif op == "favorite":
+        if not isinstance(operation.get("is_favorite"), (bool, type(None))):
+            return "is_favorite must be true, false or omitted"
+    elif op == "tags":
+        tags = operation.get("tags") or []
+        if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+            return "tags must be a list of strings"
+        joined = ", ".join(dict.fromkeys(tag.strip() for tag in tags if tag.strip()))
+        if len(joined) > bulk_field_limit("tags"):
+            return "tags are too long"
+        operation["tags"] = tags
+    return None
+
+
+@csrf_exempt
+def bulk_update_library(request):
+    """
+    Applies a list of library operations in one transaction.
+
+    Body: {"operations": [{"op": "add", "olid": ..., "title": ..., "author": ...,
+    "cover_url": ..., "pages": ...}, {"op": "remove", "olid": ...},
+    {"op": "progress", "olid": ..., "progress": 42}, {"op": "favorite",
+    "olid": ..., "is_favorite": true}, {"op": "tags", "olid": ..., "tags": [...]}]}
+
+    Adds run first, then progress/favorite/tags updates (later ones win for
+    the same book), then removals. Each phase is a bulk query, and the
+    response has one result per operation, in order.
+    """
+    if request.method != "POST":
+        return JsonResponse({"success": False, "message": "Invalid request"}, status=400)
+    if not request.user.is_authenticated:
+        return JsonResponse({"success": False, "message": "Not logged in"}, status=403)
+
+    try:
+        operations = json.loads(request.body).get("operations", [])
+    except (ValueError, AttributeError):
+        return JsonResponse({"success": False, "message": "Invalid JSON"}, status=400)
+    if not isinstance(operations, list):
+        return JsonResponse({"success": False, "message": "operations must be a list"}, status=400)
+    if len(operations) > BULK_MAX_OPERATIONS:
+        return JsonResponse({
+            "success": False,
+            "message": f"Too many operations (max {BULK_MAX_OPERATIONS})"
+        }, status=400)
+
+    results = [None] * len(operations)
+    valid = []
+    for index, operation in enumerate(operations):
+        error = clean_bulk_operation(operation)
+        if error:
+            results[index] = {"success": False, "message": error}
+        else:
+            valid.append((index, operation))
+
+    user = request.user
+    with transaction.atomic():
+        olids = {operation["olid"] for _, operation in valid}
+        books = {
+            book.olid: book
+            for book in UserBookList.objects.filter(user=user, olid__in=olids)
+            .only('id', 'olid', 'pages', 'current_page', 'status', 'is_favorite', 'tags')
+        }
+
+        # 1) Adds: one bulk INSERT, then one enrichment job per new OLID
+        new_books = {}
+        for index, operation in valid:
+            if operation["op"] != "add":
+                continue
+            olid = operation["olid"]
+            if olid in books or olid in new_books:
+                results[index] = {"success": True, "message": "Book already in your list!"}
+                continue
+            pages = operation["pages"]
+            new_books[olid] = UserBookList(
+                user=user,
+                olid=olid,
+                title=operation.get("title") or "Unknown Title",
+                author=operation.get("author"),
+                cover_url=operation.get("cover_url"),
+                pages=pages,
+                status=UserBookList.compute_status(0, pages),
+            )
+            results[index] = {"success": True, "message": "Book added successfully!"}
+        if new_books:
+            UserBookList.objects.bulk_create(new_books.values(), ignore_conflicts=True)
+            books.update({
+                book.olid: book
+                for book in UserBookList.objects.filter(user=user, olid__in=new_books.keys())
+                .only('id', 'olid', 'pages', 'current_page', 'status', 'is_favorite', 'tags')
+            })
+            enqueue_books_enrichment(new_books.keys())
+
+        # 2) Progress, favourite and tag updates: one bulk UPDATE
+        changed_books = {}
+        changed_fields = set()
+        tags_by_book = {}
+        for index, operation in valid:
+            op, olid = operation["op"], operation["olid"]
+            if op not in ('progress', 'favorite', 'tags'):
+                continue
+            book = books.get(olid)
+            if book is None:
+                results[index] = {"success": False, "message": "Book not found"}
+                continue
+            if op == 'progress':
+                book.current_page = operation["progress"]
+                book.status = UserBookList.compute_status(book.current_page, book.pages)
+                changed_fields.update(['current_page', 'status'])
+                results[index] = {"success": True, "progress": book.current_page}
+            elif op == 'favorite':
+                is_favorite = operation.get("is_favorite")
+                book.is_favorite = (not book.is_favorite) if is_favorite is None else bool(is_favorite)
+                changed_fields.add('is_favorite')
+                results[index] = {"success": True, "is_favorite": book.is_favorite}
+            else:
+                book.set_tags_list(operation["tags"])
+                tags_by_book[book.pk] = book.get_tags_list()
+                changed_fields.add('tags')
+                results[index] = {"success": True, "tags": book.get_tags_list()}
+            changed_books[book.pk] = book
+        if changed_books:
+            UserBookList.objects.bulk_update(changed_books.values(), sorted(changed_fields), batch_size=500)
+        if tags_by_book:
+            UserBookList.bulk_sync_tags(user.id, tags_by_book)
+
+        # 3) Removals: one DELETE
+        removed = set()
+        for index, operation in valid:
+            if operation["op"] != "remove":
+                continue
+            olid = operation["olid"]
+            if olid in books and olid not in removed:
+                removed.add(olid)
+                results[index] = {"success": True, "message": "Book removed successfully!"}
+            else:
+                results[index] = {"success": False, "message": "Book not found or already removed."}
+        if removed:
+            UserBookList.objects.filter(user=user, olid__in=removed).delete()
+
+    if new_books or removed or tags_by_book:
+        invalidate_recommendations(user.id)
+
+    for index, result in enumerate(results):
+        result["olid"] = operations[index].get("olid") if isinstance(operations[index], dict) else None
+    return JsonResponse({"success": True, "results": results})
+
+
+# --- PAGINATED LIBRARY (JSON, keyset pagination)
+LIBRARY_PAGE_SIZE = 50
+LIBRARY_MAX_PAGE_SIZE = 200
+LIBRARY_FIELDS = ['olid', 'title', 'author', 'cover_url', 'pages', 'current_page', 'status', 'is_favorite', 'tags', 'description']
+LIBRARY_DEFAULT_FIELDS = ['olid', 'title', 'author', 'cover_url', 'pages', 'current_page', 'status', 'is_favorite']
+LIBRARY_SORTS = {
+    'title': F('title'),
+    'author': Coalesce(F('author'), Value('')),
+    'progress': Case(
+        When(pages__gt=0, then=Cast('current_page', FloatField()) * 100 / F('pages')),
+        default=Value(0.0),
+        output_field=FloatField(),
+    ),
+}
+
+
+def encode_cursor(sort, descending, value, pk):
+    """Returns an opaque cursor for the last row of a page, tied to its sort and order"""
+    order = 'desc' if descending else 'asc'
+    return base64.urlsafe_b64encode(json.dumps([sort, order, value, pk]).encode()).decode()
+
+
+def decode_cursor(cursor, sort, descending):
+    """
+    Returns (sort value, id) from a cursor made for the same sort and
+    order, or raises ValueError.
+    """
+    try:
+        cursor_sort, order, value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort or order != ('desc' if descending else 'asc'):
+        raise ValueError("Cursor is for a different sort or order")
+    value_types = (int, float) if sort == 'progress' else (str,)
+    if not isinstance(value, value_types) or isinstance(value, bool) or not isinstance(pk, int) or isinstance(pk, bool):
+        raise ValueError("Invalid cursor")
+    return value, pk
+
+
+def library_books(request):
+    """
+    Returns one page of the user's library.
+
+    Query parameters: tag, favorite (true/false), status (comma-separated),
+    sort (title/author/progress), order (asc/desc), limit, fields
+    (comma-separated projection) and cursor (the next_cursor of the
+    previous page). Pages are keyset-paginated on (sort key, id), so every
+    page costs the same however deep into the library it is.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({"success": False, "message": "Not logged in"}, status=403)
+
+    sort = request.GET.get('sort', 'title')
+    if sort not in LIBRARY_SORTS:
+        return JsonResponse({"success": False, "message": f"Invalid sort '{sort}'"}, status=400)
+    descending = request.GET.get('order', 'asc') == 'desc'
+
+    try:
+        limit = min(max(int(request.GET.get('limit', LIBRARY_PAGE_SIZE)), 1), LIBRARY_MAX_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({"success": False, "message": "Invalid limit"}, status=400)
+
+    fields = [f for f in request.GET.get('fields', '').split(',') if f in LIBRARY_FIELDS] or LIBRARY_DEFAULT_FIELDS
+
+    books = UserBookList.objects.filter(user=request.user)
+
+    # --- Server-side filters ---
+    tag = request.GET.get('tag')
+    if tag:
+        books = books.filter(tag_set__name=tag)
+    favorite = request.GET.get('favorite')
+    if favorite in ('true', 'false'):
+        books = books.filter(is_favorite=favorite == 'true')
+    status = request.GET.get('status')
+    if status:
+        books = books.filter(status__in=status.split(','))
+
+    # --- Keyset pagination on (sort key, id) ---
+    books = books.annotate(sort_key=LIBRARY_SORTS[sort])
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            last_value, last_id = decode_cursor(cursor, sort, descending)
+        except ValueError as e:
+            return JsonResponse({"success": False, "message": str(e)}, status=400)
+        if descending:
+            books = books.filter(Q(sort_key__lt=last_value) | Q(sort_key=last_value, id__lt=last_id))
+        else:
+            books = books.filter(Q(sort_key__gt=last_value) | Q(sort_key=last_value, id__gt=last_id))
+
+    ordering = ['-sort_key', '-id'] if descending else ['sort_key', 'id']
+    rows = list(books.order_by(*ordering).values('id', 'sort_key', *fields)[:limit + 1])
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(sort, descending, rows[-1]['sort_key'], rows[-1]['id'])
+
+    results = []
+    for row in rows:
+        book = {field: row[field] for field in fields}
+        if 'tags' in book:
+            book['tags'] = [tag.strip() for tag in (book['tags'] or '').split(',') if tag.strip()]
+        if 'cover_url' in book:
+            book['thumb_url'] = local_cover_url(book['cover_url'], 'grid')
+        results.append(book)
+
+    return JsonResponse({"success": True, "books": results, "next_cursor": next_cursor})
+
+
+# --- LIBRARY IMPORT (Goodreads / CSV exports)
+@csrf_exempt
+def import_library(request):
+    """
+    Accepts a Goodreads or plain CSV export and queues it for import.
+
+    The upload is streamed to IMPORT_UPLOAD_DIR in chunks and processed by
+    the job worker, so large libraries never tie up a web request. Poll the
+    returned status_url for progress.
+    """
+    if request.method != "POST":
+        return JsonResponse({"success": False, "message": "Invalid request"}, status=400)
+    if not request.user.is_authenticated:
+        return JsonResponse({"success": False, "message": "Not logged in"}, status=403)
+    if 'file' not in request.FILES:
+        return JsonResponse({"success": False, "message": "No file provided"}, status=400)
+
+    file = request.FILES['file']
+    if os.path.splitext(file.name)[1].lower() != '.csv':
+        return JsonResponse({"success": False, "message": "Please upload a CSV file"}, status=400)
+    if file.size > settings.IMPORT_MAX_FILE_SIZE:
+        return JsonResponse({
+            "success": False,
+            "message": f"File too large. Maximum size is {settings.IMPORT_MAX_FILE_SIZE // (1024 * 1024)}MB"
+        }, status=400)
+
+    os.makedirs(settings.IMPORT_UPLOAD_DIR, exist_ok=True)
+    file_path = os.path.join(settings.IMPORT_UPLOAD_DIR, f"{request.user.id}_{uuid.uuid4().hex}.csv")
+    with open(file_path, 'wb') as destination:
+        for chunk in file.chunks():
+            destination.write(chunk)
+
+    library_import = LibraryImport.objects.create(user=request.user, file_path=file_path)
+    enqueue_library_import(library_import.id)
+
+    return JsonResponse({
+        "success": True,
+        "import_id": library_import.id,
+        "status_url": reverse('import_status', args=[library_import.id]),
+    }, status=202)
+
+
+def import_status(request, import_id):
+    """Returns the progress of one of the user's imports"""
+    if not request.user.is_authenticated:
+        return JsonResponse({"success": False, "message": "Not logged in"}, status=403)
+
+    library_import = LibraryImport.objects.filter(id=import_id, user=request.user).first()
+    if library_import is None:
+        return JsonResponse({"success": False, "message": "Import not found"}, status=404)
+
+    return JsonResponse({
+        "success": True,
+        "status": library_import.status,
+        "processed_rows": library_import.processed_rows,
+        "imported_books": library_import.imported_books,
+        "skipped_rows": library_import.skipped_rows,
+        "errors": library_import.errors,
+        "finished_at": library_import.finished_at.isoformat() if library_import.finished_at else None,
+    })
+
+
+# --- DATA EXPORTS (CSV / NDJSON, streamed)
+def get_export_user(request):
+    """
+    Returns the user whose data is exported: the requester, or for staff
+    the user named by ?user_id=. Returns None if not allowed; raises
+    ValueError if user_id is not a number.
+    """
+    if not request.user.is_authenticated:
+        return None
+    user_id = request.GET.get("user_id")
+    if user_id and request.user.is_staff:
+        return User.objects.filter(id=int(user_id)).first()
+    return request.user
+
+
+def export_library(request):
+    """Streams the user's whole library; ?format=csv (default) or ndjson"""
+    try:
+        user = get_export_user(request)
+    except ValueError:
+        return JsonResponse({"success": False, "message": "Invalid user_id"}, status=400)
+    if user is None:
+        return JsonResponse({"success": False, "message": "Not allowed"}, status=403)
+    export_format = request.GET.get("format", "csv")
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({"success": False, "message": "Unknown format"}, status=400)
+
+    books = UserBookList.objects.filter(user=user).order_by('id')
+    return stream_export(books, LIBRARY_EXPORT_FIELDS, export_format, "library")
+
+
+def export_purchases(request):
+    """Streams the user's whole purchase history; ?format=csv (default) or ndjson"""
+    try:
+        user = get_export_user(request)
+    except ValueError:
+        return JsonResponse({"success": False, "message": "Invalid user_id"}, status=400)
+    if user is None:
+        return JsonResponse({"success": False, "message": "Not allowed"}, status=403)
+    export_format = request.GET.get("format", "csv")
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({"success": False, "message": "Unknown format"}, status=400)
+
+    purchases = Purchase.objects.filter(user=user).order_by('id')
+    return stream_export(purchases, PURCHASE_EXPORT_FIELDS, export_format, "purchases")
 
 
 # --- PURCHASE BOOK VIEW
@@ -873,35 +1288,16 @@ def purchase_book(request):
                        billing_address, billing_city, billing_state, billing_zip, billing_country]):
                 return JsonResponse({"success": False, "message": "Missing required fields"}, status=400)
             
-            # Get book details from Open Library API
-            try:
-                response = requests.get(f"https://openlibrary.org/works/{olid}.json", timeout=10)
-                if response.status_code != 200:
-                    return JsonResponse({"success": False, "message": "Book not found"}, status=404)
-            except requests.RequestException as e:
-                return JsonResponse({"success": False, "message": "Failed to fetch book details"}, status=500)
-            
-            book_data = response.json()
-            title = book_data.get('title', 'Unknown Title')
+            # Get book details from the metadata store (reads through to Open Library)
+            metadata = get_book_metadata(olid)
+            if metadata is None:
+                if openlibrary.circuit_open("records"):
+                    return JsonResponse({"success": False, "message": "Book details are temporarily unavailable. Please try again shortly."}, status=503)
+                return JsonResponse({"success": False, "message": "Book not found"}, status=404)
             
-            # Get author with better error handling
-            author = 'Unknown Author'
-            try:
-                if 'authors' in book_data and book_data['authors']:
-                    author_key = book_data['authors'][0].get('author', {}).get('key')
-                    if author_key:
-                        author_response = requests.get(f"https://openlibrary.org{author_key}.json", timeout=5)
-                        if author_response.status_code == 200:
-                            author = author_response.json().get('name', 'Unknown Author')
-            except Exception as e:
-                print(f"Error fetching author: {e}")
-                author = 'Unknown Author'
-            
-            # Get cover
-            cover_url = None
-            if 'covers' in book_data and book_data['covers']:
-                cover_id = book_data['covers'][0]
-                cover_url = f"https://covers.openlibrary.org/b/id/{cover_id}-L.jpg"
+            title = metadata.title
+            author = metadata.authors[0] if metadata.authors else 'Unknown Author'
+            cover_url = metadata.cover_url
             
             # Generate unique transaction ID
             transaction_id = f"TXN-{secrets.token_hex(8).upper()}"
@@ -957,6 +1353,7 @@ def get_purchase_history(request):
             'book_title': purchase.book_title,
             'book_author': purchase.book_author,
             'book_cover_url': purchase.book_cover_url,
+            'book_cover_thumb_url': local_cover_url(purchase.book_cover_url, 'grid'),
             'price': str(purchase.price),
             'payment_method': purchase.get_payment_method_display(),
             'card_last_four': purchase.card_last_four,
@@ -972,16 +1369,156 @@ def get_purchase_history(request):
 # book
 # views.py
 from django.http import JsonResponse
-from time import time
 
 
-# loads book but always the newest version of book
+# loads the newest version of the book; the URL only changes when its content does
 def get_mock_book(request):
+    book_file = BookFile.objects.filter(key=settings.MOCK_BOOK_FILE_KEY).first()
+    if book_file:
+        pdf_url = f"{reverse('book_file', args=[book_file.key])}?v={book_file.version}"
+    else:
+        pdf_url = "https://krigeshohndypdhbvijn.supabase.co/storage/v1/object/public/books/mock_book_400_pages.pdf"
     return JsonResponse({
         "title": "The Chronicles of Random Thought",
-        "pdf_url": "https://krigeshohndypdhbvijn.supabase.co/storage/v1/object/public/books/mock_book_400_pages.pdf?v=" + str(int(time()))
+        "pdf_url": pdf_url,
+        # Set once the book is split into pages; the reader then loads page windows instead of the PDF
+        "pages_url": reverse('book_pages', args=[book_file.key]) if book_file and book_file.page_count else None,
     })
 
 
+def book_file(request, key):
+    """
+    Serves a book file from book storage with HTTP Range support.
+
+    The content hash is the strong ETag: If-None-Match gets a 304, and
+    Range/If-Range requests get a 206 with just the requested bytes, so
+    pdf.js only downloads the pages it renders. URLs carrying the current
+    ?v= version are cacheable for a year; others must revalidate.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({"success": False, "message": "Not logged in"}, status=403)
+
+    book_file = BookFile.objects.filter(key=key).first()
+    if book_file is None:
+        raise Http404("Book file not found")
+
+    if request.GET.get("v") == book_file.version:
+        cache_control = "private, max-age=31536000, immutable"
+    else:
+        cache_control = "private, no-cache"
+
+    if book_file.etag in request.headers.get("If-None-Match", ""):
+        response = HttpResponseNotModified()
+        response["ETag"] = book_file.etag
+        response["Cache-Control"] = cache_control
+        return response
+
+    size = book_file.size
+    byte_range = parse_range(request.headers.get("Range"), size)
+    if_range = request.headers.get("If-Range")
+    if if_range and if_range != book_file.etag:
+        # The client's partial copy is of another version; send it all
+        byte_range = None
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    if byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(iter_file_range(book_file.name, start, end), status=206,
+                                         content_type=book_file.content_type)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    else:
+        start, end = 0, size - 1
+        response = StreamingHttpResponse(iter_file_range(book_file.name, start, end),
+                                         content_type=book_file.content_type)
+
+    response["Content-Length"] = str(end - start + 1)
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = book_file.etag
+    response["Cache-Control"] = cache_control
+    return response
+
+
 def reader_view(request):
     return render(request, "reader.html")
+
+
+# --- PAGE WINDOWS (per-page text and renders, for the reader)
+def book_pages(request, key):
+    """
+    Returns a window of pages of a book file around a position.
+
+    Query: around=<page> (or olid=<OLID> to start at the user's saved
+    current_page), before=2, after=3. Pages carry their text and, when
+    rendered, an image URL. Responds with ready=false until the book has
+    been split, so the reader can fall back to the PDF.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({"success": False, "message": "Not logged in"}, status=403)
+
+    book_file = BookFile.objects.filter(key=key).first()
+    if book_file is None:
+        return JsonResponse({"success": False, "message": "Book file not found"}, status=404)
+    if not book_file.page_count:
+        return JsonResponse({"success": True, "ready": False})
+
+    try:
+        around = int(request.GET.get("around", 0))
+        before = int(request.GET.get("before", 2))
+        after = int(request.GET.get("after", 3))
+    except ValueError:
+        return JsonResponse({"success": False, "message": "Invalid page window"}, status=400)
+
+    olid = request.GET.get("olid")
+    if not around and olid:
+        # Resume from the position synced through update_progress
+        around = (
+            UserBookList.objects.filter(user=request.user, olid=olid).values_list("current_page", flat=True).first()
+            or 1
+        )
+
+    pages = get_page_window(book_file, around or 1, before, after)
+    return JsonResponse({
+        "success": True,
+        "ready": True,
+        "version": book_file.version,
+        "page_count": book_file.page_count,
+        "around": min(max(around or 1, 1), book_file.page_count),
+        "pages": [
+            {
+                "number": page.number,
+                "text": page.text,
+                "image_url": (
+                    f"{reverse('book_page_image', args=[key, page.number])}?v={book_file.version}"
+                    if page.image_name else None
+                ),
+            }
+            for page in pages
+        ],
+    })
+
+
+def book_page_image(request, key, number):
+    """Serves the render of one page; the name is its content hash, so it doubles as the ETag"""
+    if not request.user.is_authenticated:
+        return JsonResponse({"success": False, "message": "Not logged in"}, status=403)
+
+    book_file = BookFile.objects.filter(key=key).only("sha256").first()
+    image_name = (
+        BookPage.objects.filter(sha256=book_file.sha256, number=number).values_list("image_name", flat=True).first()
+        if book_file else None
+    )
+    if not image_name:
+        raise Http404("Page image not found")
+
+    etag = f'"{os.path.splitext(os.path.basename(image_name))[0]}"'
+    if etag in request.headers.get("If-None-Match", ""):
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(get_book_storage().open(image_name, 'rb'), content_type='image/jpeg')
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, max-age=31536000, immutable"
+    return response
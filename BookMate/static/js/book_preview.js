@@ -192,7 +192,8 @@ document.addEventListener("DOMContentLoaded", () => {
       const olid = addButton.getAttribute("data-olid");
       const title = document.querySelector("h2")?.textContent || "";
       const author = document.querySelector("h3")?.textContent || "Unknown Author";
-      const cover_url = document.querySelector(".main-book")?.src || "";
+      const coverImage = document.querySelector(".main-book");
+      const cover_url = coverImage?.dataset.cover || coverImage?.src || "";
 
       try {
         const res = await fetch("/api/add_book/", {
@@ -1,7 +1,8 @@
 // dashboard.js
-import { fetchBooks, removeBook } from "./utils/api.js";
+import { fetchBooks, removeBook, streamLibrary } from "./utils/api.js";
 import {
   toggleSections,
+  createLibraryCard,
   renderSearchResults,
   handleBookRemoval,
   attachAddButtonHandlers,
@@ -21,8 +22,38 @@ document.addEventListener("DOMContentLoaded", () => {
   restoreSearchFromURL();
   initProgressBars();
   attachAddButtonHandlers(); // Attach handlers for recommendation books
+  loadRemainingBooks();
 });
 
+// 📚 The template renders the first page of the library; stream the rest from /api/library/
+async function loadRemainingBooks() {
+  const bookGrid = document.getElementById("user-books");
+  const cursor = bookGrid?.dataset.nextCursor;
+  if (!cursor) return;
+
+  const params = { sort: "title", limit: 200, fields: "olid,title,author,cover_url,pages,current_page,is_favorite,tags" };
+  try {
+    const result = await streamLibrary(params, (books) => {
+      books.forEach((book) => bookGrid.appendChild(createLibraryCard(book)));
+    }, cursor);
+    if (!result.success) throw new Error(result.message);
+  } catch (err) {
+    console.error("❌ Error loading library:", err);
+    showError("Some of your books couldn't be loaded. Please refresh the page.", { title: "Library Error" });
+  }
+
+  initProgressBars();
+
+  // Cards arrive in title order; re-apply whatever filter or sort the user picked meanwhile
+  const activeFilter = document.querySelector(".filter-btn.active");
+  const sortSelect = document.getElementById("sortSelect");
+  if (activeFilter && activeFilter.dataset.filter !== "all") {
+    activeFilter.click();
+  } else if (sortSelect && sortSelect.value !== "title-asc") {
+    sortBooks(sortSelect.value);
+  }
+}
+
 // Initialize progress bars on page load
 // function initProgressBars() {
 //   const progressBars = document.querySelectorAll('[data-progress-bar]');
@@ -103,6 +134,7 @@ function initSearchHandler() {
 
     try {
       const data = await fetchBooks(query);
+      if (data.unavailable) showWarning(data.message, { title: "Search Unavailable" });
       renderSearchResults(data.results, query)
     } catch (err) {
       console.error("❌ Error fetching books:", err);
@@ -188,10 +220,12 @@ function initFilterHandler() {
   filterHandlerInitialized = true;
 
   const filterButtons = document.querySelectorAll(".filter-btn");
-  const bookCards = document.querySelectorAll("#user-books .book-card");
 
   filterButtons.forEach((btn) => {
     btn.addEventListener("click", () => {
+      // Looked up on every click: more cards stream in after page load
+      const bookCards = document.querySelectorAll("#user-books .book-card");
+
       // Update active button
       filterButtons.forEach((b) => b.classList.remove("active"));
       btn.classList.add("active");
@@ -18,18 +18,77 @@ if (savedPage) {
 
 
 
+// ✅ Page-window mode: pages come a few at a time from the server
+let pagesUrl = null;
+let pageCount = 0;
+const loadedPages = new Map();
+const PAGES_BEFORE = 2;
+const PAGES_AFTER = 5;
+
+
 fetch("/api/mock-book/")
   .then(res => res.json())
   .then(data => {
-    pdfjsLib.getDocument(data.pdf_url).promise.then(pdf => {
-      pdfDoc = pdf;
-      renderPage(currentPage);   // ✅ resumes correctly
-      loadChapters();  
-    });
+    if (data.pages_url) {
+      pagesUrl = data.pages_url;
+      loadPageWindow(bookId !== "default-book" ? null : currentPage).then(around => {
+        if (around === null) return openPdf(data.pdf_url);   // not split yet
+        currentPage = around;
+        renderPage(currentPage);
+        loadChapters();
+      });
+    } else {
+      openPdf(data.pdf_url);
+    }
   });
 
 
+function openPdf(pdfUrl) {
+  // ✅ Fetch only the byte ranges needed for the pages being rendered
+  pdfjsLib.getDocument({
+    url: pdfUrl,
+    rangeChunkSize: 65536,
+    disableAutoFetch: true,
+    disableStream: true,
+  }).promise.then(pdf => {
+    pdfDoc = pdf;
+    renderPage(currentPage);   // ✅ resumes correctly
+    loadChapters();
+  });
+}
+
+
+// Loads pages around `around`, or around the saved current_page when null
+function loadPageWindow(around) {
+  const params = new URLSearchParams({ before: PAGES_BEFORE, after: PAGES_AFTER });
+  if (around) {
+    params.set("around", around);
+  } else {
+    params.set("olid", bookId);
+  }
+
+  return fetch(`${pagesUrl}?${params}`)
+    .then(res => res.json())
+    .then(data => {
+      if (!data.success || !data.ready) return null;
+      pageCount = data.page_count;
+      data.pages.forEach(page => loadedPages.set(page.number, page));
+      return data.around;
+    });
+}
+
+
+function totalPages() {
+  return pdfDoc ? pdfDoc.numPages : pageCount;
+}
+
+
 function renderPage(num) {
+  if (!pdfDoc) {
+    renderWindowPage(num);
+    return;
+  }
+
   pdfDoc.getPage(num).then((page) => {
     const viewport = page.getViewport({ scale: 1.1 });
 
@@ -45,8 +104,7 @@ function renderPage(num) {
 
     pageNumberDisplay.textContent = `Page ${num} / ${pdfDoc.numPages}`;
 
-    // ✅ SAVE PROGRESS
-    localStorage.setItem(STORAGE_KEY, num);
+    saveProgress(num);
 
     // ✅ SYNC CHAPTER DROPDOWN WITH PAGE
     highlightCurrentChapter(num);
@@ -54,6 +112,76 @@ function renderPage(num) {
 }
 
 
+function renderWindowPage(num) {
+  const page = loadedPages.get(num);
+  if (!page) {
+    loadPageWindow(num).then(() => {
+      if (loadedPages.has(num)) renderWindowPage(num);
+    });
+    return;
+  }
+
+  if (page.image_url) {
+    const image = new Image();
+    image.onload = () => {
+      canvas.width = image.naturalWidth;
+      canvas.height = image.naturalHeight;
+      ctx.drawImage(image, 0, 0);
+    };
+    image.src = page.image_url;
+  } else {
+    drawPageText(page.text);
+  }
+
+  pageNumberDisplay.textContent = `Page ${num} / ${pageCount}`;
+  saveProgress(num);
+
+  // ✅ Prefetch the next window before the reader reaches its end
+  const ahead = Math.min(num + PAGES_AFTER - 1, pageCount);
+  if (!loadedPages.has(ahead)) loadPageWindow(ahead);
+}
+
+
+function drawPageText(text) {
+  canvas.width = 800;
+  canvas.height = 1100;
+  ctx.fillStyle = "#fff";
+  ctx.fillRect(0, 0, canvas.width, canvas.height);
+  ctx.fillStyle = "#222";
+  ctx.font = "18px Georgia, serif";
+
+  let y = 50;
+  (text || "").split("\n").forEach(paragraph => {
+    let line = "";
+    paragraph.split(" ").forEach(word => {
+      const candidate = line ? `${line} ${word}` : word;
+      if (ctx.measureText(candidate).width > canvas.width - 100 && line) {
+        ctx.fillText(line, 50, y);
+        y += 26;
+        line = word;
+      } else {
+        line = candidate;
+      }
+    });
+    ctx.fillText(line, 50, y);
+    y += 26;
+  });
+}
+
+
+// ✅ SAVE PROGRESS locally and to the library (the server coalesces rapid updates)
+function saveProgress(num) {
+  localStorage.setItem(STORAGE_KEY, num);
+  if (bookId === "default-book") return;
+
+  fetch("/api/update_progress/", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ olid: bookId, progress: num }),
+  }).catch(() => {});
+}
+
+
 function highlightCurrentChapter(currentPage) {
   const select = document.getElementById("chapterSelect");
   const options = select.options;
@@ -69,7 +197,7 @@ function highlightCurrentChapter(currentPage) {
 
 
 function nextPage() {
-  if (currentPage >= pdfDoc.numPages) return;
+  if (currentPage >= totalPages()) return;
   currentPage++;
   renderPage(currentPage);
 }
@@ -87,6 +215,11 @@ function prevPage() {
 function loadChapters() {
   const select = document.getElementById("chapterSelect");
 
+  if (!pdfDoc) {
+    select.innerHTML = '<option value="">Go to Chapter</option><option disabled>No chapters detected</option>';
+    return;
+  }
+
   pdfDoc.getOutline().then(outline => {
     select.innerHTML = '<option value="">Go to Chapter</option>';
 
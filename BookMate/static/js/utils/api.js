@@ -26,3 +26,22 @@ export async function removeBook(olid) {
   const data = await res.json();
   return { ...data, success: res.ok };
 }
+
+// 📚 Fetch one page of the user’s library (filters: tag, favorite, status, sort, order, limit, fields)
+export async function fetchLibraryPage(params = {}, cursor = null) {
+  const query = new URLSearchParams(params);
+  if (cursor) query.set("cursor", cursor);
+  const res = await fetch(`/api/library/?${query}`);
+  return res.json();
+}
+
+// 📚 Stream the library page by page (from `cursor`, if given), calling onPage(books) as each page arrives
+export async function streamLibrary(params = {}, onPage, cursor = null) {
+  do {
+    const data = await fetchLibraryPage(params, cursor);
+    if (!data.success) return data;
+    onPage(data.books);
+    cursor = data.next_cursor;
+  } while (cursor);
+  return { success: true };
+}
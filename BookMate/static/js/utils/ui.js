@@ -27,7 +27,7 @@ export function renderSearchResults(data, query) {
     card.dataset.olid = book.olid;
 
     card.innerHTML = `
-      <img src="${book.cover_url}" alt="cover" class="book-cover">
+      <img src="${book.thumb_url || book.cover_url}" alt="cover" class="book-cover">
       <p class="book-title">${book.title}</p>
       <p class="book-author">${book.author || "Unknown"}</p>
       <!-- ➕ Add Button -->
@@ -55,7 +55,7 @@ export function createBookCard(book) {
 
   // Match CSS classes — no inline styles
   const coverHTML = book.cover_url
-    ? `<img src="${book.cover_url}" alt="${book.title}" class="book-cover">`
+    ? `<img src="${book.thumb_url || book.cover_url}" alt="${book.title}" class="book-cover">`
     : `<div class="no-cover">No Cover</div>`;
 
   card.innerHTML = `
@@ -76,6 +76,67 @@ export function createBookCard(book) {
 }
 
 
+// Escape text before putting it into HTML
+function escapeHTML(value) {
+  const div = document.createElement("div");
+  div.textContent = value ?? "";
+  return div.innerHTML.replace(/"/g, "&quot;");
+}
+
+// Create a library card (same markup as the dashboard template) from an /api/library/ row
+export function createLibraryCard(book) {
+  const title = escapeHTML(book.title);
+  const author = escapeHTML(book.author || "");
+  const olid = escapeHTML(book.olid);
+  const pages = Number(book.pages) || 0;
+  const current = Number(book.current_page) || 0;
+  const percent = pages > 0 ? Math.round((current / pages) * 100) : 0;
+  const tags = book.tags || [];
+
+  const card = document.createElement("div");
+  card.className = "book-card";
+  card.dataset.olid = book.olid;
+  card.dataset.title = book.title || "";
+  card.dataset.author = book.author || "";
+  card.dataset.pages = pages;
+  card.dataset.page = current;
+
+  card.innerHTML = `
+    <a href="/book/${encodeURIComponent(book.olid)}/" class="book-card-link">
+      <img src="${escapeHTML(book.thumb_url || book.cover_url)}" alt="${title} cover" class="book-cover">
+      <p class="book-title">${title}</p>
+      <p class="book-author">${author}</p>
+    </a>
+    ${tags.length ? `
+    <div class="book-metadata">
+      <div class="metadata-row">
+        ${tags.map((tag) => `<span class="micro-tag-badge">${escapeHTML(tag)}</span>`).join("")}
+      </div>
+    </div>` : ""}
+    <div class="reading-progress-container">
+      <div class="progress-info">
+        <span class="progress-text" data-progress-text>Page ${current} of ${pages}</span>
+        <span class="progress-percentage">${percent}%</span>
+      </div>
+      <div class="progress-bar-wrapper">
+        <div class="progress-bar-bg">
+          <div class="progress-bar-fill" data-progress-bar data-current="${current}" data-total="${pages}"></div>
+        </div>
+      </div>
+    </div>
+    <div class="book-actions">
+      <button class="favorite-btn ${book.is_favorite ? "favorited" : ""}" data-olid="${olid}" title="${book.is_favorite ? "Remove from favorites" : "Add to favorites"}">
+        <span class="star-icon">${book.is_favorite ? "★" : "☆"}</span>
+      </button>
+      <button class="edit-btn" data-olid="${olid}" data-page="${current}" data-pages="${pages}">📝 Progress</button>
+      <button class="remove-btn" data-olid="${olid}">❌ Remove</button>
+    </div>
+  `;
+
+  return card;
+}
+
+
 // Add “Add to List” button handlers
 export function attachAddButtonHandlers() {
   document.querySelectorAll(".add-btn").forEach(btn => {